@@ -0,0 +1 @@
+""" Throughput benchmarks of the gyms, run with ``python -m benchmarks``. """
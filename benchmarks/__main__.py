@@ -0,0 +1,75 @@
+import os
+from typing import Optional
+
+import typer
+
+from benchmarks import flappy_bird, snake  # noqa: F401, registers the benchmarks
+from benchmarks.harness import compare, load, run, save
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+        pattern: str = typer.Option(
+            "",
+            "--filter",
+            "-k",
+            help="Only run the benchmarks whose name contains this text"
+        ),
+        min_time: float = typer.Option(
+            1.0,
+            "--min-time",
+            help="Seconds to spend timing each benchmark"
+        ),
+        output: Optional[str] = typer.Option(
+            None,
+            "--output",
+            "-o",
+            help="Path to write the results to, as JSON"
+        ),
+        baseline: str = typer.Option(
+            DEFAULT_BASELINE,
+            "--baseline",
+            "-b",
+            help="Results to compare against"
+        ),
+        tolerance: float = typer.Option(
+            0.2,
+            "--tolerance",
+            help="Fraction of the baseline throughput a benchmark may lose before it counts as a regression"
+        ),
+        update_baseline: bool = typer.Option(
+            False,
+            "--update-baseline",
+            help="Store these results as the baseline instead of comparing against it"
+        )
+) -> None:
+    report = run(pattern, min_time, echo=typer.echo)
+
+    if output is not None:
+        save(report, output)
+
+    if update_baseline:
+        save(report, baseline)
+        typer.echo(f"Baseline written to {baseline}")
+        return
+
+    if not os.path.exists(baseline):
+        typer.echo(f"No baseline at {baseline}, run with --update-baseline to store one", err=True)
+        raise typer.Exit(code=1)
+
+    regressions = compare(report, load(baseline), tolerance)
+    for name, current, reference, ratio in regressions:
+        typer.echo(f"REGRESSION {name}: {current:,.0f} ops/s vs {reference:,.0f} ops/s baseline ({ratio:.0%})",
+                   err=True)
+    if regressions:
+        raise typer.Exit(code=1)
+
+    typer.echo(f"No regressions against {baseline}")
+
+
+if __name__ == "__main__":
+    app(prog_name="benchmarks")
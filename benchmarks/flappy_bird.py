@@ -0,0 +1,90 @@
+""" Flappy Bird benchmarks.
+
+The bird flaps whenever it falls below the gap of the next pipe, which keeps
+it alive long enough for resets not to dominate the step numbers.
+"""
+
+import numpy as np
+
+from benchmarks.harness import register
+from gyms.FlappyBird.FlappyBirdSimpleGym import FlappyBirdSimpleGym
+from gyms.FlappyBird.FlappyBirdVecEnv import FlappyBirdVecEnv
+from gyms.FlappyBird.game_logic import FlappyBirdLogic
+
+
+def policy(game, pipe_gap=100):
+    _, _, lower_pipe_y = game.next_pipe()
+    return int(game.player_y > lower_pipe_y - pipe_gap / 2)
+
+
+@register("flappy_bird.logic.step")
+def logic_step():
+    rng = np.random.default_rng(0)
+    game = FlappyBirdLogic(screen_size=(288, 512), np_random=rng)
+
+    def step():
+        nonlocal game
+        if not game.update_state(policy(game)):
+            game = FlappyBirdLogic(screen_size=(288, 512), np_random=rng)
+
+    return step
+
+
+@register("flappy_bird.gym.step", pixel_collision=(False, True))
+def gym_step(pixel_collision):
+    env = FlappyBirdSimpleGym(pixel_collision=pixel_collision)
+    env.reset(seed=0)
+
+    def step():
+        _, _, terminated, truncated, _ = env.step(policy(env._game))
+        if terminated or truncated:
+            env.reset()
+
+    return step
+
+
+@register("flappy_bird.vec_env.step", num_envs=(16, 256, 4096), pixel_collision=(False, True))
+def vec_env_step(num_envs, pixel_collision):
+    env = FlappyBirdVecEnv(num_envs, pixel_collision=pixel_collision)
+    env.seed(0)
+    env.reset()
+    game = env.game
+
+    def step():
+        # Flap below the gap of the next pipe, like `policy`
+        env.step((game.obs[:, 1] < 0).astype(np.int64))
+
+    return step, num_envs
+
+
+@register("flappy_bird.gym.reset")
+def gym_reset():
+    env = FlappyBirdSimpleGym()
+    env.reset(seed=0)
+    return env.reset
+
+
+@register("flappy_bird.gym.render")
+def gym_render():
+    env = FlappyBirdSimpleGym(render_mode="rgb_array")
+    env.reset(seed=0)
+    return env.render
+
+
+@register("flappy_bird.vec_env.render", num_envs=(64,))
+def vec_env_render(num_envs):
+    env = FlappyBirdVecEnv(num_envs, render_mode="rgb_array")
+    env.seed(0)
+    env.reset()
+    return env.get_images, num_envs
+
+
+@register("flappy_bird.render.draw_surface")
+def render_draw_surface():
+    from gyms.FlappyBird.renderer import FlappyBirdRenderer
+
+    env = FlappyBirdSimpleGym()
+    env.reset(seed=0)
+    renderer = FlappyBirdRenderer(audio_on=False)
+    renderer.game = env._game
+    return renderer.draw_surface
@@ -0,0 +1,107 @@
+""" Registry, timing loop and baseline comparison of the benchmarks. """
+
+import itertools
+import json
+import platform
+import time
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+#: Benchmark name -> function returning the operation to time and how many
+#: units (e.g. environment steps) one call of it performs.
+BENCHMARKS: Dict[str, Callable[[], Tuple[Callable[[], None], int]]] = {}
+
+
+def register(name: str, when: Callable[..., bool] = None, **grid):
+    """ Registers a benchmark once for every combination of the `grid` parameters.
+
+    The decorated function receives one combination as keyword arguments and
+    returns the operation to time, or a tuple of the operation and the number
+    of units it performs per call. Combinations rejected by `when` are skipped.
+    """
+    def decorator(fn):
+        keys = list(grid)
+        for values in itertools.product(*grid.values()):
+            params = dict(zip(keys, values))
+            if when is not None and not when(**params):
+                continue
+            label = ",".join(f"{key}={value}" for key, value in params.items())
+            full_name = f"{name}[{label}]" if label else name
+
+            def setup(fn=fn, params=params):
+                op = fn(**params)
+                return op if isinstance(op, tuple) else (op, 1)
+
+            BENCHMARKS[full_name] = setup
+        return fn
+
+    return decorator
+
+
+def measure(op: Callable[[], None], units: int, min_time: float) -> Dict[str, float]:
+    """ Times `op` for at least `min_time` seconds, after a short warm up. """
+    for _ in range(10):
+        op()
+
+    calls, elapsed, batch = 0, 0.0, 1
+    while elapsed < min_time:
+        start = time.perf_counter()
+        for _ in range(batch):
+            op()
+        elapsed += time.perf_counter() - start
+        calls += batch
+        batch *= 2
+
+    return {
+        "ops_per_sec": calls * units / elapsed,
+        "us_per_op": elapsed / (calls * units) * 1e6,
+        "ops": calls * units,
+    }
+
+
+def run(pattern: str, min_time: float, echo=print) -> Dict:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern not in name:
+            continue
+
+        op, units = setup()
+        results[name] = measure(op, units, min_time)
+        echo(f"{name:<60} {results[name]['ops_per_sec']:>14,.0f} ops/s")
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float):
+    """ Returns ``(name, current, baseline, ratio)`` for the benchmarks slower than the baseline allows. """
+    regressions = []
+    for name, result in report["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+
+        ratio = result["ops_per_sec"] / reference["ops_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions.append((name, result["ops_per_sec"], reference["ops_per_sec"], ratio))
+
+    return regressions
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save(report, path):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
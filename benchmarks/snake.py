@@ -0,0 +1,134 @@
+""" Snake benchmarks.
+
+Steps follow a Hamiltonian cycle of the board, so the snake keeps the length
+it was laid out with instead of dying after a few random moves, and the
+numbers measure stepping rather than resetting.
+"""
+
+import numpy as np
+
+from benchmarks.harness import register
+from gyms.Snake.SnakeGym import SnakeGym
+from gyms.Snake.SnakeVecEnv import SnakeVecEnv
+from gyms.Snake.utils import OBS_MODES
+from gyms.Snake.vec_game_logic import VecSnake
+
+BOARDS = (10, 20, 40)
+LENGTHS = (4, 32, 256)
+NUM_ENVS = (16, 256)
+
+# Direction codes of `Direction.step`, keyed by the move they make
+_DIRECTIONS = {(0, -1): 0, (0, 1): 1, (-1, 0): 2, (1, 0): 3}
+
+
+def hamiltonian_cycle(width, height):
+    """ Cells of a cycle visiting the whole board, and the direction to take on each cell.
+
+    The cycle zigzags over every row but the first column, which leads back to
+    the start, so `height` has to be even.
+    """
+    cells = []
+    for y in range(height):
+        xs = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+        cells.extend((x, y) for x in xs)
+    cells.extend((0, y) for y in range(height - 1, -1, -1))
+
+    directions = np.zeros((width, height), dtype=np.int64)
+    for (x, y), (next_x, next_y) in zip(cells, cells[1:] + cells[:1]):
+        directions[x, y] = _DIRECTIONS[next_x - x, next_y - y]
+
+    return cells, directions
+
+
+def lay_out(snake, length, cells, directions):
+    """ Starts an episode of `snake` with a body of `length` blocks lying along the cycle `cells`. """
+    snake.lay_out(cells[:length], cells[length], int(directions[cells[length - 1]]))
+
+
+def _fits(board, length, **_):
+    return length < board * board // 2
+
+
+@register("snake.logic.step", when=_fits, board=BOARDS, length=LENGTHS)
+def logic_step(board, length):
+    """ `Snake.step` with its observation and reward, for a snake of `length` blocks. """
+    env = SnakeGym(width=board, height=board, max_step=np.iinfo(np.int64).max)
+    snake = env.snake
+    snake.seed(0)
+    cells, directions = hamiltonian_cycle(board, board)
+    lay_out(snake, length, cells, directions)
+
+    def step():
+        _, _, done, _ = snake.step(directions[snake.head.x, snake.head.y])
+        if done:
+            lay_out(snake, length, cells, directions)
+
+    return step
+
+
+@register("snake.gym.step", board=BOARDS, obs_mode=OBS_MODES)
+def gym_step(board, obs_mode):
+    env = SnakeGym(width=board, height=board, obs_mode=obs_mode, max_step=np.iinfo(np.int64).max)
+    env.reset(seed=0)
+    snake = env.snake
+    cells, directions = hamiltonian_cycle(board, board)
+    lay_out(snake, snake.init_length, cells, directions)
+
+    def step():
+        _, _, terminated, truncated, _ = env.step(directions[snake.head.x, snake.head.y])
+        if terminated or truncated:
+            lay_out(snake, snake.init_length, cells, directions)
+
+    return step
+
+
+@register("snake.gym.reset", board=BOARDS)
+def gym_reset(board):
+    env = SnakeGym(width=board, height=board)
+    env.reset(seed=0)
+    return env.reset
+
+
+@register("snake.gym.render", board=BOARDS)
+def gym_render(board):
+    env = SnakeGym(render_mode="rgb_array", width=board, height=board)
+    env.reset(seed=0)
+    return env.render
+
+
+@register("snake.vec_logic.step", num_envs=NUM_ENVS)
+def vec_logic_step(num_envs):
+    snake = VecSnake(num_envs, width=20, height=20, seed=0)
+    snake.init()
+    actions = np.random.default_rng(0).integers(0, 4, size=(1024, num_envs))
+    counter = iter(range(1 << 62))
+
+    def step():
+        _, _, terminated, truncated = snake.step(actions[next(counter) % len(actions)])
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            snake.init(done)
+
+    return step, num_envs
+
+
+@register("snake.vec_env.step", num_envs=NUM_ENVS)
+def vec_env_step(num_envs):
+    env = SnakeVecEnv(num_envs, width=20, height=20)
+    env.seed(0)
+    env.reset()
+    actions = np.random.default_rng(0).integers(0, 4, size=(1024, num_envs))
+    counter = iter(range(1 << 62))
+
+    def step():
+        env.step(actions[next(counter) % len(actions)])
+
+    return step, num_envs
+
+
+@register("snake.vec_env.render", num_envs=(64,))
+def vec_env_render(num_envs):
+    env = SnakeVecEnv(num_envs, render_mode="rgb_array", width=20, height=20)
+    env.seed(0)
+    env.reset()
+    return env.get_images, num_envs
@@ -2,10 +2,10 @@ from typing import Tuple, Optional
 
 import gymnasium as gym
 import numpy as np
-import pygame
 
 from gyms.FlappyBird.game_logic import PLAYER_HEIGHT, FlappyBirdLogic, PIPE_WIDTH, PLAYER_WIDTH, PIPE_HEIGHT
-from gyms.FlappyBird.renderer import FlappyBirdRenderer
+from gyms.FlappyBird.hitmasks import load_hitmasks
+from gyms.utils import repeat_action
 
 
 def calculate_reward(h_dist, v_dist):
@@ -18,15 +18,22 @@ def calculate_reward(h_dist, v_dist):
 
 
 class FlappyBirdSimpleGym(gym.Env):
-    metadata = {'render.modes': ['human']}
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 30}
 
     def __init__(self,
+                 render_mode: Optional[str] = None,
                  screen_size: Tuple[int, int] = (288, 512),
                  normalize_obs: bool = True,
                  pipe_gap: int = 100,
+                 pixel_collision: bool = False,
+                 action_repeat: int = 1,
+                 max_pool_obs: bool = False,
                  bird_color: str = "yellow",
                  pipe_color: str = "green",
                  background: Optional[str] = "day") -> None:
+        if action_repeat < 1:
+            raise ValueError(f"Actions must be repeated at least once, got {action_repeat}")
+
         self.action_space = gym.spaces.discrete.Discrete(2)
         self.observation_space = gym.spaces.box.Box(-np.inf, np.inf,
                                                     shape=(2,),
@@ -34,27 +41,29 @@ class FlappyBirdSimpleGym(gym.Env):
         self._screen_size = screen_size
         self._normalize_obs = normalize_obs
         self._pipe_gap = pipe_gap
-
+        # Pixel-perfect collisions instead of the sprites' rectangles
+        self._hitmasks = (load_hitmasks(bird_color, pipe_color)
+                          if pixel_collision else None)
+        # Frames played per step, see `repeat_action`
+        self._action_repeat = action_repeat
+        self._max_pool_obs = max_pool_obs
+
+        self.render_mode = render_mode
         self._game = None
         self._renderer = None
+        self._rgb_renderer = None
 
         self._bird_color = bird_color
         self._pipe_color = pipe_color
         self._bg_type = background
 
     def _get_observation(self):
-        up_pipe = low_pipe = None
-        h_dist = 0
-        for up_pipe, low_pipe in zip(self._game.upper_pipes,
-                                     self._game.lower_pipes):
-            h_dist = (low_pipe["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-            h_dist += 3  # extra distance to compensate for the buggy hit-box
-            if h_dist >= 0:
-                break
-
-        upper_pipe_y = up_pipe["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe["y"]
+        pipe_x, upper_pipe_y, lower_pipe_y = self._game.next_pipe()
+        h_dist = (pipe_x + PIPE_WIDTH / 2
+                  - (self._game.player_x - PLAYER_WIDTH / 2))
+        h_dist += 3  # extra distance to compensate for the buggy hit-box
+
+        upper_pipe_y += PIPE_HEIGHT
         player_y = self._game.player_y
 
         v_dist = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
@@ -67,9 +76,15 @@ class FlappyBirdSimpleGym(gym.Env):
         return np.array([
             h_dist,
             v_dist,
-        ])
+        ], dtype=np.float32)
 
     def step(self, action):
+        if self._action_repeat == 1:
+            return self._step_frame(action)
+        return repeat_action(self._step_frame, action, self._action_repeat,
+                             self._max_pool_obs)
+
+    def _step_frame(self, action):
         alive = self._game.update_state(action)
         obs = self._get_observation()
 
@@ -82,15 +97,24 @@ class FlappyBirdSimpleGym(gym.Env):
         return obs, reward, done, False, info
 
     def reset(self, **kwargs):
+        super().reset(seed=kwargs.get("seed"))
         self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
+                                     pipe_gap_size=self._pipe_gap,
+                                     np_random=self.np_random,
+                                     hitmasks=self._hitmasks)
         if self._renderer is not None:
             self._renderer.game = self._game
 
-        return self._get_observation()
+        return self._get_observation(), {"score": self._game.score}
+
+    def render(self) -> Optional[np.ndarray]:
+        if self.render_mode == "rgb_array":
+            return self._render_rgb_array().copy()
 
-    def render(self) -> None:
         if self._renderer is None:
+            # Imported on first use, so workers that never draw don't load pygame
+            from gyms.FlappyBird.renderer import FlappyBirdRenderer
+
             self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
                                                 bird_color=self._bird_color,
                                                 pipe_color=self._pipe_color,
@@ -101,8 +125,21 @@ class FlappyBirdSimpleGym(gym.Env):
         self._renderer.draw_surface(show_score=True)
         self._renderer.update_display()
 
+    def _render_rgb_array(self) -> np.ndarray:
+        if self._rgb_renderer is None:
+            from gyms.FlappyBird.rgb_renderer import RgbRenderer
+
+            self._rgb_renderer = RgbRenderer(screen_size=self._screen_size,
+                                             bird_color=self._bird_color,
+                                             pipe_color=self._pipe_color,
+                                             background=self._bg_type)
+
+        return self._rgb_renderer.render(self._game)
+
     def close(self):
         if self._renderer is not None:
+            import pygame
+
             pygame.display.quit()
             self._renderer = None
 
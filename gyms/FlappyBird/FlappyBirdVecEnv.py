@@ -0,0 +1,72 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from gyms.FlappyBird.vec_game_logic import VecFlappyBird
+
+
+class FlappyBirdVecEnv(VecEnv):
+    """ Stable Baselines 3 `VecEnv` running every Flappy Bird game in this process.
+
+    All games are stepped by a single `VecFlappyBird` instead of one
+    `FlappyBirdSimpleGym` per `SubprocVecEnv` worker. Crashed games are reset
+    automatically, with their last observation stored under
+    ``terminal_observation`` like the SB3 envs do.
+    """
+
+    def __init__(self, num_envs, render_mode=None, **kwargs) -> None:
+        self.render_mode = render_mode
+        self.game = VecFlappyBird(num_envs, **kwargs)
+        self._actions = None
+
+        super().__init__(
+            num_envs,
+            spaces.Box(-np.inf, np.inf, shape=(2,), dtype=np.float32),
+            spaces.Discrete(2)
+        )
+
+    def reset(self):
+        if all(seed is not None for seed in self._seeds):
+            self.game.seed(self._seeds)
+        self._reset_seeds()
+
+        self.game.init()
+        return self.game.observation().copy()
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, dones = self.game.step(self._actions)
+
+        infos = self.game.infos()
+        done_indices = np.flatnonzero(dones)
+        for i in done_indices:
+            infos[i]["terminal_observation"] = obs[i].copy()
+            infos[i]["TimeLimit.truncated"] = False
+
+        if len(done_indices):
+            self.game.init(done_indices)
+            obs = self.game.observation()
+
+        return obs.copy(), rewards, dones, infos
+
+    def get_images(self):
+        if self.render_mode != "rgb_array":
+            return [None for _ in range(self.num_envs)]
+        return list(self.game.rgb_array())
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [getattr(self, method_name)(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
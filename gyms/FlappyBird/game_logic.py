@@ -28,12 +28,12 @@ GitHub repository by `sourahbhv` (https://github.com/sourabhv/FlapPyBird),
 released under the MIT license.
 """
 
-import random
 from enum import IntEnum
-from itertools import cycle
-from typing import Union, Dict, Tuple
+from typing import Iterator, Union, Tuple, Optional
 
-import pygame
+import numpy as np
+
+from gyms.utils import get_rng_state, set_rng_state
 
 ############################ Speed and Acceleration ############################
 PIPE_VEL_X = -4
@@ -43,6 +43,8 @@ PLAYER_MIN_VEL_Y = -8  # min vel along Y, max ascend speed
 
 PLAYER_ACC_Y = 1       # players downward acceleration
 PLAYER_VEL_ROT = 3     # angular speed
+PLAYER_MIN_ROT = -90   # rotation when falling
+PLAYER_ROT_THR = 20    # max visible rotation (only the sprite is clamped)
 
 PLAYER_FLAP_ACC = -9   # players speed on flapping
 ################################################################################
@@ -62,10 +64,39 @@ BACKGROUND_WIDTH = 288
 BACKGROUND_HEIGHT = 512
 ################################################################################
 
+#: Sprite shown on each frame of the player's flapping animation.
+PLAYER_INDEX_CYCLE = (0, 1, 2, 1)
+
+#: Pipes a game can hold at once. Pipes are half a screen apart and leave
+#: the screen before a fourth one spawns.
+MAX_PIPES = 4
+
+#: Number of scalars at the front of a :meth:`FlappyBirdLogic.get_state`
+#: snapshot.
+_STATE_HEADER = 12
+
 class FlappyBirdLogic:
+    """ Handles the logic of the Flappy Bird game.
+
+    Args:
+        screen_size (Tuple[int, int]): The screen's width and height.
+        pipe_gap_size (int): Space between a lower and an upper pipe.
+        np_random (Optional[np.random.Generator]): Generator of the pipes'
+            gaps.
+        hitmasks (Optional[Hitmasks]): Masks of the sprites, see
+            :func:`gyms.FlappyBird.hitmasks.load_hitmasks`. When given, the
+            player only hits a pipe when their drawn pixels overlap instead of
+            when their rectangles do.
+    """
+
     def __init__(self,
                  screen_size: Tuple[int, int],
-                 pipe_gap_size: int = 100) -> None:
+                 pipe_gap_size: int = 100,
+                 np_random: Optional[np.random.Generator] = None,
+                 hitmasks=None) -> None:
+        self._np_random = (np_random if np_random is not None
+                           else np.random.default_rng())
+        self._hitmasks = hitmasks
         self._screen_width = screen_size[0]
         self._screen_height = screen_size[1]
 
@@ -79,25 +110,19 @@ class FlappyBirdLogic:
         self.score = 0
         self._pipe_gap_size = pipe_gap_size
 
-        # Generate 2 new pipes to add to upper_pipes and lower_pipes lists
-        new_pipe1 = self._get_random_pipe()
-        new_pipe2 = self._get_random_pipe()
-
-        # List of upper pipes:
-        self.upper_pipes = [
-            {"x": self._screen_width + 200,
-             "y": new_pipe1[0]["y"]},
-            {"x": self._screen_width + 200 + (self._screen_width / 2),
-             "y": new_pipe2[0]["y"]},
-        ]
-
-        # List of lower pipes:
-        self.lower_pipes = [
-            {"x": self._screen_width + 200,
-             "y": new_pipe1[1]["y"]},
-            {"x": self._screen_width + 200 + (self._screen_width / 2),
-             "y": new_pipe2[1]["y"]},
-        ]
+        # Pipes, as a ring buffer of `num_pipes` slots starting at
+        # `_first_pipe` (the oldest pipe). `_next_pipe` is the slot of the
+        # first pipe the player hasn't passed yet, see :meth:`next_pipe`.
+        self.pipe_x = [0.0] * MAX_PIPES
+        self.upper_pipe_y = [0] * MAX_PIPES
+        self.lower_pipe_y = [0] * MAX_PIPES
+        self._first_pipe = 0
+        self._next_pipe = 0
+        self.num_pipes = 0
+
+        # Generate 2 new pipes
+        self._add_pipe(self._screen_width + 200)
+        self._add_pipe(self._screen_width + 200 + (self._screen_width / 2))
 
         # Player's info:
         self.player_vel_y = -9  # player"s velocity along Y
@@ -108,25 +133,102 @@ class FlappyBirdLogic:
 
         self._player_flapped = False
         self.player_idx = 0
-        self._player_idx_gen = cycle([0, 1, 2, 1])
+        self._player_idx_pos = 0
         self._loop_iter = 0
 
     class Actions(IntEnum):
         """ Possible actions for the player to take. """
         IDLE, FLAP = 0, 1
 
-    def _get_random_pipe(self) -> Dict[str, int]:
-        """ Returns a randomly generated pipe. """
+    def _add_pipe(self, x: float) -> None:
+        """ Appends a pipe with a randomly placed gap at `x`. """
         # y of gap between upper and lower pipe
-        gap_y = random.randrange(0,
-                                 int(self.base_y * 0.6 - self._pipe_gap_size))
+        gap_y = int(self._np_random.integers(
+            0, int(self.base_y * 0.6 - self._pipe_gap_size)))
         gap_y += int(self.base_y * 0.2)
 
-        pipe_x = self._screen_width + 10
-        return [
-            {"x": pipe_x, "y": gap_y - PIPE_HEIGHT},          # upper pipe
-            {"x": pipe_x, "y": gap_y + self._pipe_gap_size},  # lower pipe
-        ]
+        slot = (self._first_pipe + self.num_pipes) % MAX_PIPES
+        self.pipe_x[slot] = x
+        self.upper_pipe_y[slot] = gap_y - PIPE_HEIGHT
+        self.lower_pipe_y[slot] = gap_y + self._pipe_gap_size
+        self.num_pipes += 1
+
+    def _is_behind(self, slot: int) -> bool:
+        """ Whether the player has passed the pipe in `slot`.
+
+        Uses the same distance as the observation of
+        :class:`FlappyBirdSimpleGym`, with its extra 3 pixels.
+        """
+        return (self.pipe_x[slot] + PIPE_WIDTH / 2
+                - (self.player_x - PLAYER_WIDTH / 2) + 3 < 0)
+
+    def pipes(self) -> Iterator[Tuple[float, int, int]]:
+        """ Yields the x and the upper and lower pipes' y of every pipe,
+        oldest first. """
+        for i in range(self.num_pipes):
+            slot = (self._first_pipe + i) % MAX_PIPES
+            yield (self.pipe_x[slot], self.upper_pipe_y[slot],
+                   self.lower_pipe_y[slot])
+
+    def next_pipe(self) -> Tuple[float, int, int]:
+        """ Returns the x and the upper and lower pipes' y of the first pipe
+        ahead of the player, or of the last pipe if the player passed them
+        all. """
+        slot = self._next_pipe
+        return (self.pipe_x[slot], self.upper_pipe_y[slot],
+                self.lower_pipe_y[slot])
+
+    def get_state(self) -> bytes:
+        """ Returns a snapshot of the game's state, for :meth:`set_state`.
+
+        The snapshot is an immutable `bytes` string holding the player's and
+        the pipes' state followed by the state of the random generator used
+        for the pipes, so a restored game plays out exactly like the original.
+        """
+        header = np.array([
+            self.player_x, self.player_y, self.base_x, self.score,
+            self.player_vel_y, self.player_rot, self._player_flapped,
+            self.player_idx, self._player_idx_pos, self._loop_iter,
+            np.nan if self.last_action is None else self.last_action,
+            self.num_pipes,
+        ], dtype=np.float64)
+        pipes = np.array(list(self.pipes()), dtype=np.float64).T
+
+        return b"".join((header.tobytes(), pipes.tobytes(),
+                         get_rng_state(self._np_random).tobytes()))
+
+    def set_state(self, state: bytes) -> None:
+        """ Restores a snapshot taken by :meth:`get_state`. """
+        header = np.frombuffer(state, np.float64, _STATE_HEADER)
+        (self.player_x, self.player_y, self.base_x, self.score,
+         self.player_vel_y, self.player_rot, flapped, player_idx,
+         player_idx_pos, loop_iter, last_action, num_pipes) = header.tolist()
+
+        self.score = int(self.score)
+        self._player_flapped = bool(flapped)
+        self.player_idx = int(player_idx)
+        self._player_idx_pos = int(player_idx_pos)
+        self._loop_iter = int(loop_iter)
+        self.last_action = None if np.isnan(last_action) else int(last_action)
+        self.sound_cache = None
+
+        num_pipes = int(num_pipes)
+        pipes = np.frombuffer(state, np.float64, 3 * num_pipes, header.nbytes)
+        xs, upper_ys, lower_ys = pipes.reshape(3, num_pipes).tolist()
+        self.pipe_x[:num_pipes] = xs
+        self.upper_pipe_y[:num_pipes] = [int(y) for y in upper_ys]
+        self.lower_pipe_y[:num_pipes] = [int(y) for y in lower_ys]
+        self._first_pipe = 0
+        self.num_pipes = num_pipes
+
+        self._next_pipe = 0
+        while (self._next_pipe < num_pipes - 1
+               and self._is_behind(self._next_pipe)):
+            self._next_pipe += 1
+
+        set_rng_state(self._np_random,
+                      np.frombuffer(state, np.uint64, 6,
+                                    header.nbytes + pipes.nbytes))
 
     def check_crash(self) -> bool:
         """ Returns True if player collides with the ground (base) or a pipe.
@@ -134,23 +236,35 @@ class FlappyBirdLogic:
         # if player crashes into ground
         if self.player_y + PLAYER_HEIGHT >= self.base_y - 1:
             return True
-        else:
-            player_rect = pygame.Rect(self.player_x, self.player_y,
-                                      PLAYER_WIDTH, PLAYER_HEIGHT)
 
-            for up_pipe, low_pipe in zip(self.upper_pipes, self.lower_pipes):
-                # upper and lower pipe rects
-                up_pipe_rect = pygame.Rect(up_pipe['x'], up_pipe['y'],
-                                           PIPE_WIDTH, PIPE_HEIGHT)
-                low_pipe_rect = pygame.Rect(low_pipe['x'], low_pipe['y'],
-                                            PIPE_WIDTH, PIPE_HEIGHT)
+        # Pipes are at least half a screen apart, so only the next pipe and
+        # the one before it can reach the player
+        if self._collides(self._next_pipe):
+            return True
+        return (self._next_pipe != self._first_pipe
+                and self._collides((self._next_pipe - 1) % MAX_PIPES))
 
-                # check collision
-                up_collide = player_rect.colliderect(up_pipe_rect)
-                low_collide = player_rect.colliderect(low_pipe_rect)
+    def _collides(self, slot: int) -> bool:
+        """ Whether the player overlaps the upper or lower pipe in `slot`.
 
-                if up_collide or low_collide:
-                    return True
+        Coordinates are truncated to integers like pygame's rects do.
+        """
+        if self._hitmasks is not None:
+            return self._hitmasks.collides(
+                self.player_x, self.player_y, self.player_idx,
+                self.player_rot, self.pipe_x[slot], self.upper_pipe_y[slot],
+                self.lower_pipe_y[slot])
+
+        player_x, player_y = int(self.player_x), int(self.player_y)
+        pipe_x = int(self.pipe_x[slot])
+        if not (pipe_x < player_x + PLAYER_WIDTH
+                and player_x < pipe_x + PIPE_WIDTH):
+            return False
+
+        for pipe_y in (self.upper_pipe_y[slot], self.lower_pipe_y[slot]):
+            if (pipe_y < player_y + PLAYER_HEIGHT
+                    and player_y < pipe_y + PIPE_HEIGHT):
+                return True
 
         return False
 
@@ -176,23 +290,24 @@ class FlappyBirdLogic:
             self.sound_cache = "hit"
             return False
 
-        # check for score
+        # check for score (only the next pipe can be passing the player)
         player_mid_pos = self.player_x + PLAYER_WIDTH / 2
-        for pipe in self.upper_pipes:
-            pipe_mid_pos = pipe['x'] + PIPE_WIDTH / 2
-            if pipe_mid_pos <= player_mid_pos < pipe_mid_pos + 4:
-                self.score += 1
-                self.sound_cache = "point"
+        pipe_mid_pos = self.pipe_x[self._next_pipe] + PIPE_WIDTH / 2
+        if pipe_mid_pos <= player_mid_pos < pipe_mid_pos + 4:
+            self.score += 1
+            self.sound_cache = "point"
 
         # player_index base_x change
         if (self._loop_iter + 1) % 3 == 0:
-            self.player_idx = next(self._player_idx_gen)
+            self.player_idx = PLAYER_INDEX_CYCLE[self._player_idx_pos]
+            self._player_idx_pos = ((self._player_idx_pos + 1)
+                                    % len(PLAYER_INDEX_CYCLE))
 
         self._loop_iter = (self._loop_iter + 1) % 30
         self.base_x = -((-self.base_x + 100) % self._base_shift)
 
         # rotate the player
-        if self.player_rot > -90:
+        if self.player_rot > PLAYER_MIN_ROT:
             self.player_rot -= PLAYER_VEL_ROT
 
         # player's movement
@@ -209,21 +324,22 @@ class FlappyBirdLogic:
         self.player_y += min(self.player_vel_y,
                              self.base_y - self.player_y - PLAYER_HEIGHT)
 
-        # move pipes to left
-        for up_pipe, low_pipe in zip(self.upper_pipes, self.lower_pipes):
-            up_pipe['x'] += PIPE_VEL_X
-            low_pipe['x'] += PIPE_VEL_X
+        # move pipes to left (unused slots too, they are overwritten on spawn)
+        for slot in range(MAX_PIPES):
+            self.pipe_x[slot] += PIPE_VEL_X
 
         # add new pipe when first pipe is about to touch left of screen
-        if len(self.upper_pipes) > 0 and 0 < self.upper_pipes[0]['x'] < 5:
-            new_pipe = self._get_random_pipe()
-            self.upper_pipes.append(new_pipe[0])
-            self.lower_pipes.append(new_pipe[1])
+        first_x = self.pipe_x[self._first_pipe]
+        if self.num_pipes > 0 and 0 < first_x < 5:
+            self._add_pipe(self._screen_width + 10)
 
         # remove first pipe if its out of the screen
-        if (len(self.upper_pipes) > 0 and
-                self.upper_pipes[0]['x'] < -PIPE_WIDTH):
-            self.upper_pipes.pop(0)
-            self.lower_pipes.pop(0)
+        if self.num_pipes > 0 and first_x < -PIPE_WIDTH:
+            self._first_pipe = (self._first_pipe + 1) % MAX_PIPES
+            self.num_pipes -= 1
+
+        last_pipe = (self._first_pipe + self.num_pipes - 1) % MAX_PIPES
+        if self._next_pipe != last_pipe and self._is_behind(self._next_pipe):
+            self._next_pipe = (self._next_pipe + 1) % MAX_PIPES
 
         return True
\ No newline at end of file
@@ -0,0 +1,171 @@
+""" Pixel-perfect collisions between the game's sprites.
+
+A hitmask holds the opaque pixels of a sprite as a boolean array shaped
+``(height, width)``. The masks are decoded once per process from the sprite
+atlas (see :func:`load_hitmasks`), with the bird at every rotation it can be
+drawn at, so a collision test is a few slices and a logical and. A whole batch of
+games is tested at once with the masks' rows packed into integers.
+
+Only :func:`load_hitmasks` needs pygame, which it imports on first use.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from gyms.FlappyBird.game_logic import PLAYER_INDEX_CYCLE, PLAYER_MIN_ROT, PLAYER_ROT_THR
+
+
+def overlap(mask1: np.ndarray, x1: float, y1: float,
+            mask2: np.ndarray, x2: float, y2: float) -> bool:
+    """ Whether two hitmasks, with their top left corners at (x1, y1) and
+    (x2, y2), have an opaque pixel in common.
+
+    Positions are truncated to integers, like pygame's rects and the renderers
+    do.
+    """
+    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+    height1, width1 = mask1.shape
+    height2, width2 = mask2.shape
+
+    left, right = max(x1, x2), min(x1 + width1, x2 + width2)
+    top, bottom = max(y1, y2), min(y1 + height1, y2 + height2)
+    if left >= right or top >= bottom:
+        return False
+
+    return bool(np.any(mask1[top - y1:bottom - y1, left - x1:right - x1]
+                       & mask2[top - y2:bottom - y2, left - x2:right - x2]))
+
+
+class Hitmasks:
+    """ Hitmasks of the bird, at every rotation, and of the pipes.
+
+    The bird's masks are cropped to its opaque pixels, which rotated sprites
+    have a lot of room around, so their rectangles already rule out most
+    near misses. Use :func:`load_hitmasks` to share them within the process.
+
+    Args:
+        bird_color (str): Color of the flappy bird.
+        pipe_color (str): Color of the pipes.
+    """
+
+    def __init__(self,
+                 bird_color: str = "yellow",
+                 pipe_color: str = "green") -> None:
+        from gyms.FlappyBird.rgb_renderer import load_atlas
+
+        atlas = load_atlas(bird_color, pipe_color, background=None)
+        self.upper_pipe, self.lower_pipe = (pipe.hitmask for pipe in atlas.pipes)
+
+        # players[idx][rot] and its (y, x) offset in the drawn sprite
+        self.players = []
+        self._offsets = []
+        for idx in range(max(PLAYER_INDEX_CYCLE) + 1):
+            masks, offsets = [], []
+            for rot in range(PLAYER_MIN_ROT, PLAYER_ROT_THR + 1):
+                mask = atlas.player(idx, rot).hitmask
+                rows = np.flatnonzero(mask.any(axis=1))
+                cols = np.flatnonzero(mask.any(axis=0))
+                masks.append(mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1])
+                offsets.append((int(rows[0]), int(cols[0])))
+            self.players.append(masks)
+            self._offsets.append(offsets)
+
+        #: y and x offsets, height and width of each player mask, indexed by
+        #: :meth:`player_index`
+        self.player_boxes = np.array([offset + mask.shape
+                                      for offsets, masks in zip(self._offsets, self.players)
+                                      for offset, mask in zip(offsets, masks)])
+
+        # Rows of the masks as bits (masks are at most 64 pixels wide), for
+        # `collides_batch`. The player masks are padded to the same height.
+        height = self.player_boxes[:, 2].max()
+        self._player_bits = np.zeros((len(self.player_boxes), height), dtype=np.uint64)
+        for i, mask in enumerate(mask for masks in self.players for mask in masks):
+            self._player_bits[i, :len(mask)] = _row_bits(mask)
+        self._pipe_bits = (_row_bits(self.upper_pipe), _row_bits(self.lower_pipe))
+
+    @staticmethod
+    def player_index(idx, rot):
+        """ Index in `player_boxes` of the mask of frame `idx` drawn at
+        rotation `rot` (numbers or arrays). """
+        rotations = PLAYER_ROT_THR - PLAYER_MIN_ROT + 1
+        return idx * rotations + (np.minimum(rot, PLAYER_ROT_THR) - PLAYER_MIN_ROT).astype(np.int64)
+
+    def collides(self,
+                 player_x: float,
+                 player_y: float,
+                 player_idx: int,
+                 player_rot: float,
+                 pipe_x: float,
+                 upper_pipe_y: float,
+                 lower_pipe_y: float) -> bool:
+        """ Whether the bird hits a pipe.
+
+        Args:
+            player_x (float): The player's x.
+            player_y (float): The player's y.
+            player_idx (int): Index of the player's sprite.
+            player_rot (float): The player's rotation.
+            pipe_x (float): The pipe's x.
+            upper_pipe_y (float): The upper pipe's y.
+            lower_pipe_y (float): The lower pipe's y.
+        """
+        idx = int(player_idx)
+        rot = (PLAYER_ROT_THR if player_rot > PLAYER_ROT_THR else int(player_rot)) - PLAYER_MIN_ROT
+        mask = self.players[idx][rot]
+        y, x = self._offsets[idx][rot]
+        height, width = mask.shape
+        x += int(player_x)
+        pipe_x = int(pipe_x)
+        pipe_height, pipe_width = self.upper_pipe.shape
+        if not (pipe_x < x + width and x < pipe_x + pipe_width):
+            return False
+
+        # The pixels are only compared where the rectangles overlap
+        y += int(player_y)
+        for pipe, pipe_y in ((self.upper_pipe, int(upper_pipe_y)),
+                             (self.lower_pipe, int(lower_pipe_y))):
+            if (pipe_y < y + height and y < pipe_y + pipe_height
+                    and overlap(mask, x, y, pipe, pipe_x, pipe_y)):
+                return True
+        return False
+
+    def collides_batch(self, player_x, player_y, player_idx, player_rot,
+                       pipe_x, upper_pipe_y, lower_pipe_y) -> np.ndarray:
+        """ :meth:`collides` over arrays of players and pipes. """
+        player = self.player_index(player_idx, player_rot)
+        offset_y, offset_x = np.take(self.player_boxes[:, :2], player, axis=0).T
+        y = np.asarray(player_y).astype(np.int64) + offset_y
+        x = np.asarray(player_x).astype(np.int64) + offset_x
+        bits = np.take(self._player_bits, player, axis=0)
+        rows = np.arange(bits.shape[1])
+
+        # Row by row, a player pixel in column c lies on pipe column c + dx
+        dx = (x - np.asarray(pipe_x).astype(np.int64))[:, None]
+        player_shift = np.minimum(np.maximum(-dx, 0), 63).astype(np.uint64)
+        pipe_shift = np.minimum(np.maximum(dx, 0), 63).astype(np.uint64)
+
+        hit = np.zeros(len(bits), dtype=bool)
+        for pipe_bits, pipe_y in zip(self._pipe_bits, (upper_pipe_y, lower_pipe_y)):
+            pipe_rows = (y - np.asarray(pipe_y).astype(np.int64))[:, None] + rows
+            inside = (0 <= pipe_rows) & (pipe_rows < len(pipe_bits))
+            under = np.where(inside, pipe_bits[np.clip(pipe_rows, 0, len(pipe_bits) - 1)], 0)
+            hit |= ((bits >> player_shift) & (under >> pipe_shift)).any(axis=1)
+
+        return hit
+
+
+def _row_bits(mask: np.ndarray) -> np.ndarray:
+    """ Packs each row of a mask, at most 64 pixels wide, into an integer
+    whose bit `c` is column `c`. """
+    padded = np.zeros((len(mask), 64), dtype=bool)
+    padded[:, :mask.shape[1]] = mask
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8")[:, 0]
+
+
+@lru_cache(maxsize=None)
+def load_hitmasks(bird_color: str = "yellow",
+                  pipe_color: str = "green") -> Hitmasks:
+    """ Returns the process-wide hitmasks of the given colors. """
+    return Hitmasks(bird_color, pipe_color)
@@ -34,9 +34,8 @@ from typing import Optional, Tuple
 import pygame
 
 from gyms.FlappyBird import utils
+from gyms.FlappyBird.game_logic import PLAYER_ROT_THR
 
-#: Player's rotation threshold.
-PLAYER_ROT_THR = 20
 
 #: Color to fill the surface's background when no background image was loaded.
 FILL_BACKGROUND_COLOR = (200, 200, 200)
@@ -67,14 +66,19 @@ class FlappyBirdRenderer:
 
         self.display = None
         self.surface = pygame.Surface(screen_size)
-        self.images = utils.load_images(convert=False,
-                                        bird_color=bird_color,
-                                        pipe_color=pipe_color,
-                                        bg_type=background)
+        # Copied, as make_display() replaces the images with converted ones
+        self.images = dict(utils.load_cached_images(bg_type=background,
+                                                    bird_color=bird_color,
+                                                    pipe_color=pipe_color))
+        self._rotated_players = {}
         self.audio_on = audio_on
         self._audio_queue = []
         if audio_on:
-            self.sounds = utils.load_sounds()
+            try:
+                self.sounds = utils.load_sounds()
+            except pygame.error:
+                # No audio device, e.g. on a headless machine
+                self.audio_on = False
 
         self.game = None
         self._clock = pygame.time.Clock()
@@ -96,6 +100,7 @@ class FlappyBirdRenderer:
             else:
                 self.images[name] = (value.convert() if name == "background"
                                      else value.convert_alpha())
+        self._rotated_players.clear()
 
     def _draw_score(self) -> None:
         """ Draws the score in the center of the surface. """
@@ -131,12 +136,11 @@ class FlappyBirdRenderer:
             self.surface.fill(FILL_BACKGROUND_COLOR)
 
         # Pipes
-        for up_pipe, low_pipe in zip(self.game.upper_pipes,
-                                     self.game.lower_pipes):
+        for pipe_x, upper_pipe_y, lower_pipe_y in self.game.pipes():
             self.surface.blit(self.images['pipe'][0],
-                              (up_pipe['x'], up_pipe['y']))
+                              (pipe_x, upper_pipe_y))
             self.surface.blit(self.images['pipe'][1],
-                              (low_pipe['x'], low_pipe['y']))
+                              (pipe_x, lower_pipe_y))
 
         # Base (ground)
         self.surface.blit(self.images['base'], (self.game.base_x,
@@ -152,11 +156,15 @@ class FlappyBirdRenderer:
         if self.game.player_rot <= PLAYER_ROT_THR:
             visible_rot = self.game.player_rot
 
-        # Player
-        player_surface = pygame.transform.rotate(
-            self.images['player'][self.game.player_idx],
-            visible_rot,
-        )
+        # Player, rotated once per sprite and angle
+        key = (self.game.player_idx, visible_rot)
+        player_surface = self._rotated_players.get(key)
+        if player_surface is None:
+            player_surface = pygame.transform.rotate(
+                self.images['player'][self.game.player_idx],
+                visible_rot,
+            )
+            self._rotated_players[key] = player_surface
 
         self.surface.blit(player_surface, (self.game.player_x,
                                            self.game.player_y))
@@ -0,0 +1,183 @@
+""" Renders the game into RGB arrays with NumPy, without a display.
+
+The sprites are decoded once per process into a :class:`SpriteAtlas`, shared
+by every renderer using the same colors and background, together with the
+bird's frames rotated to every angle it can be drawn at.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pygame
+
+from gyms.FlappyBird.game_logic import PLAYER_INDEX_CYCLE, PLAYER_MIN_ROT, PLAYER_ROT_THR
+from gyms.FlappyBird.renderer import FILL_BACKGROUND_COLOR
+from gyms.FlappyBird.utils import SPRITES_PATH
+
+
+class Sprite:
+    """ An image as an RGB array and masks of its opaque pixels.
+
+    The game's sprites are either fully opaque or fully transparent on each
+    pixel, so drawing one is a masked copy, or a plain copy when the sprite
+    has no transparent pixel.
+    """
+
+    def __init__(self, surface: pygame.Surface) -> None:
+        # Drawn on an RGBA surface first, so colorkeyed (palette) images get
+        # an alpha channel too
+        rgba = pygame.Surface(surface.get_size(), pygame.SRCALPHA, 32)
+        rgba.blit(surface, (0, 0))
+
+        self.rgb = pygame.surfarray.array3d(rgba).swapaxes(0, 1).copy()
+        self.height, self.width = self.rgb.shape[:2]
+
+        #: Opaque pixels, shaped ``(height, width)``, see :mod:`hitmasks`
+        self.hitmask = np.ascontiguousarray(
+            pygame.surfarray.array_alpha(rgba).T > 0)
+
+        # One entry per channel, a broadcast mask makes the copy much slower
+        self.mask = (None if self.hitmask.all()
+                     else np.repeat(self.hitmask[..., None], 3, axis=2))
+
+
+class SpriteAtlas:
+    """ Decoded sprites of one bird color, pipe color and background.
+
+    Use :func:`load_atlas` to share an atlas within the process.
+    """
+
+    def __init__(self,
+                 bird_color: str = "yellow",
+                 pipe_color: str = "green",
+                 background: Optional[str] = "day") -> None:
+        def load(filename):
+            return pygame.image.load(f"{SPRITES_PATH}/{filename}")
+
+        self.numbers = tuple(Sprite(load(f"{n}.png")) for n in range(10))
+        self.base = Sprite(load("base.png"))
+        self.background = (None if background is None
+                           else Sprite(load(f"background-{background}.png")))
+
+        pipe = load(f"pipe-{pipe_color}.png")
+        self.pipes = (Sprite(pygame.transform.flip(pipe, False, True)),
+                      Sprite(pipe))
+
+        self._player_surfaces = tuple(
+            load(f"{bird_color}bird-{flap}.png")
+            for flap in ("upflap", "midflap", "downflap")
+        )
+        self._players: Dict[Tuple[int, float], Sprite] = {}
+        for idx in set(PLAYER_INDEX_CYCLE):
+            for rot in range(PLAYER_MIN_ROT, PLAYER_ROT_THR + 1):
+                self.player(idx, rot)
+
+    def player(self, idx: int, rot: float) -> Sprite:
+        """ Frame `idx` of the bird, rotated by `rot` degrees. """
+        sprite = self._players.get((idx, rot))
+        if sprite is None:
+            sprite = Sprite(pygame.transform.rotate(
+                self._player_surfaces[idx], rot))
+            self._players[idx, rot] = sprite
+        return sprite
+
+
+@lru_cache(maxsize=None)
+def load_atlas(bird_color: str = "yellow",
+               pipe_color: str = "green",
+               background: Optional[str] = "day") -> SpriteAtlas:
+    """ Returns the process-wide atlas of the given colors and background. """
+    return SpriteAtlas(bird_color, pipe_color, background)
+
+
+class RgbRenderer:
+    """ Draws the game into an RGB frame, shaped ``(height, width, 3)``.
+
+    Draws the same picture as :class:`FlappyBirdRenderer`, into a frame
+    buffer that is reused by the next call, so copy the frames to keep them.
+
+    Args:
+        screen_size (Tuple[int, int]): The screen's width and height.
+        bird_color (str): Color of the flappy bird.
+        pipe_color (str): Color of the pipes.
+        background (str): Type of background image.
+        show_score (bool): Whether to draw the player's score.
+    """
+
+    def __init__(self,
+                 screen_size: Tuple[int, int] = (288, 512),
+                 bird_color: str = "yellow",
+                 pipe_color: str = "green",
+                 background: Optional[str] = "day",
+                 show_score: bool = True) -> None:
+        self._screen_width, self._screen_height = screen_size
+        self.atlas = load_atlas(bird_color, pipe_color, background)
+        self.show_score = show_score
+        self._frame = np.empty((self._screen_height, self._screen_width, 3),
+                               dtype=np.uint8)
+
+        # The background never changes, so it is drawn once
+        self._background = np.empty_like(self._frame)
+        self._background[:] = FILL_BACKGROUND_COLOR
+        if self.atlas.background is not None:
+            self._blit(self._background, self.atlas.background, 0, 0)
+
+    @staticmethod
+    def _blit(frame: np.ndarray, sprite: Sprite, x: float, y: float) -> None:
+        """ Draws `sprite` with its top left corner at (x, y), clipped to the
+        frame. """
+        x, y = int(x), int(y)
+        height, width = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite.width, width), min(y + sprite.height, height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        source = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        if sprite.mask is None:
+            frame[y0:y1, x0:x1] = sprite.rgb[source]
+        else:
+            np.copyto(frame[y0:y1, x0:x1], sprite.rgb[source],
+                      where=sprite.mask[source])
+
+    def draw(self,
+             player_x: float,
+             player_y: float,
+             player_rot: float,
+             player_idx: int,
+             base_x: float,
+             base_y: float,
+             score: int,
+             pipes: Iterable[Tuple[float, float, float]]) -> np.ndarray:
+        """ Draws a game given its state, see :meth:`render`. """
+        frame = self._frame
+        frame[:] = self._background
+
+        upper_pipe, lower_pipe = self.atlas.pipes
+        for pipe_x, upper_pipe_y, lower_pipe_y in pipes:
+            self._blit(frame, upper_pipe, pipe_x, upper_pipe_y)
+            self._blit(frame, lower_pipe, pipe_x, lower_pipe_y)
+
+        self._blit(frame, self.atlas.base, base_x, base_y)
+
+        # Score (drawn before the player, so the player overlaps it)
+        if self.show_score:
+            digits = [self.atlas.numbers[int(d)] for d in str(int(score))]
+            x_offset = (self._screen_width
+                        - sum(digit.width for digit in digits)) / 2
+            for digit in digits:
+                self._blit(frame, digit, x_offset, self._screen_height * 0.1)
+                x_offset += digit.width
+
+        visible_rot = min(player_rot, PLAYER_ROT_THR)
+        player = self.atlas.player(int(player_idx), visible_rot)
+        self._blit(frame, player, player_x, player_y)
+
+        return frame
+
+    def render(self, game) -> np.ndarray:
+        """ Draws the current state of a :class:`FlappyBirdLogic`. """
+        return self.draw(game.player_x, game.player_y, game.player_rot,
+                         game.player_idx, game.base_x, game.base_y,
+                         game.score, game.pipes())
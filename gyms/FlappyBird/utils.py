@@ -29,15 +29,20 @@ released under the MIT license.
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
 import sys
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Optional
 
+import numpy as np
 from pygame import image as pyg_image
 from pygame import mixer as pyg_mixer
+from pygame import surfarray as pyg_surfarray
 from pygame import Rect
 from pygame.transform import flip as img_flip
 
+from gyms.FlappyBird.hitmasks import overlap
+
 _BASE_DIR = Path(os.path.dirname(os.path.realpath(__file__))).parent
 
 SPRITES_PATH = str(_BASE_DIR / "FlappyBird/assets/sprites")
@@ -46,32 +51,18 @@ AUDIO_PATH = str(_BASE_DIR / "FlappyBird/assets/audio")
 
 def pixel_collision(rect1: Rect,
                     rect2: Rect,
-                    hitmask1: List[List[bool]],
-                    hitmask2: List[List[bool]]) -> bool:
+                    hitmask1: np.ndarray,
+                    hitmask2: np.ndarray) -> bool:
     """ Checks if two objects collide and not just their rects. """
-    rect = rect1.clip(rect2)
-
-    if rect.width == 0 or rect.height == 0:
-        return False
-
-    x1, y1 = rect.x - rect1.x, rect.y - rect1.y
-    x2, y2 = rect.x - rect2.x, rect.y - rect2.y
+    return overlap(hitmask1, rect1.x, rect1.y, hitmask2, rect2.x, rect2.y)
 
-    for x in range(rect.width):
-        for y in range(rect.height):
-            if hitmask1[x1 + x][y1 + y] and hitmask2[x2 + x][y2 + y]:
-                return True
-    return False
 
+def get_hitmask(image) -> np.ndarray:
+    """ Returns a hitmask using an image's alpha, shaped (height, width).
 
-def get_hitmask(image) -> List[List[bool]]:
-    """ Returns a hitmask using an image's alpha. """
-    mask = []
-    for x in range(image.get_width()):
-        mask.append([])
-        for y in range(image.get_height()):
-            mask[x].append(bool(image.get_at((x, y))[3]))
-    return mask
+    See :mod:`gyms.FlappyBird.hitmasks` for the masks of the game's sprites.
+    """
+    return np.ascontiguousarray(pyg_surfarray.array_alpha(image).T > 0)
 
 
 def _load_sprite(filename, convert, alpha=True):
@@ -136,6 +127,18 @@ def load_images(convert: bool = True,
     return images
 
 
+@lru_cache(maxsize=None)
+def load_cached_images(bg_type: Optional[str] = "day",
+                       bird_color: str = "yellow",
+                       pipe_color: str = "green") -> Dict[str, Any]:
+    """ Returns the unconverted image assets, loaded once per process.
+
+    The returned dictionary is shared, copy it before replacing its images.
+    """
+    return load_images(convert=False, bg_type=bg_type,
+                       bird_color=bird_color, pipe_color=pipe_color)
+
+
 def load_sounds() -> Dict[str, pyg_mixer.Sound]:
     """ Loads and returns the audio assets of the game. """
     pyg_mixer.init()
@@ -0,0 +1,241 @@
+""" Implements the logic of Flappy Bird for a batch of games at once. """
+
+from typing import Tuple
+
+import numpy as np
+
+from gyms.FlappyBird.game_logic import (BACKGROUND_WIDTH, BASE_WIDTH, MAX_PIPES, PIPE_HEIGHT, PIPE_VEL_X,
+                                        PIPE_WIDTH, PLAYER_ACC_Y, PLAYER_FLAP_ACC, PLAYER_HEIGHT,
+                                        PLAYER_INDEX_CYCLE, PLAYER_MAX_VEL_Y, PLAYER_MIN_ROT, PLAYER_VEL_ROT,
+                                        PLAYER_WIDTH)
+from gyms.FlappyBird.hitmasks import load_hitmasks
+from gyms.utils import BatchRandom
+
+
+class VecFlappyBird:
+    """ Steps `num_envs` games of Flappy Bird at once.
+
+    Each game is a row of shared arrays instead of a :class:`FlappyBirdLogic`
+    object. The pipes of a game are kept in the first ``n_pipes`` columns of
+    ``pipe_x``, ``upper_y`` and ``lower_y``, oldest first. Physics, scoring,
+    collisions and pipe spawning are done with array operations over the
+    whole batch, following the rules of :class:`FlappyBirdLogic`.
+
+    Every game draws its gaps from its own random stream (see `BatchRandom`).
+
+    Args:
+        num_envs (int): Number of games.
+        screen_size (Tuple[int, int]): The screen's width and height.
+        normalize_obs (bool): Whether to divide the observed distances by the
+            screen size.
+        pipe_gap (int): Space between a lower and an upper pipe.
+        pixel_collision (bool): Whether players hit pipes when their drawn
+            pixels overlap instead of when their rectangles do.
+        seed (int): Seed of the first game, the others use the next ones.
+    """
+
+    def __init__(self,
+                 num_envs: int,
+                 screen_size: Tuple[int, int] = (288, 512),
+                 normalize_obs: bool = True,
+                 pipe_gap: int = 100,
+                 pixel_collision: bool = False,
+                 seed=None) -> None:
+        self.num_envs = num_envs
+        self._screen_width, self._screen_height = screen_size
+        self._normalize_obs = normalize_obs
+        self._pipe_gap_size = pipe_gap
+        self._hitmasks = load_hitmasks() if pixel_collision else None
+
+        self.player_x = int(self._screen_width * 0.2)
+        self.base_y = self._screen_height * 0.79
+        self._base_shift = BASE_WIDTH - BACKGROUND_WIDTH
+
+        self._envs = np.arange(num_envs)
+        self.rng = BatchRandom(num_envs, seed)
+
+        self.player_y = np.zeros(num_envs)
+        self.player_vel_y = np.zeros(num_envs)
+        self.player_rot = np.zeros(num_envs)
+        self.player_idx = np.zeros(num_envs, dtype=np.int64)
+        self._player_idx_pos = np.zeros(num_envs, dtype=np.int64)
+        self._loop_iter = np.zeros(num_envs, dtype=np.int64)
+        self.base_x = np.zeros(num_envs)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+
+        self.pipe_x = np.zeros((num_envs, MAX_PIPES))
+        self.upper_y = np.zeros((num_envs, MAX_PIPES))
+        self.lower_y = np.zeros((num_envs, MAX_PIPES))
+        self.n_pipes = np.zeros(num_envs, dtype=np.int64)
+
+        self.obs = np.zeros((num_envs, 2), dtype=np.float32)
+        self._renderer = None
+
+    def seed(self, seed=None):
+        """ Seeds game `i` with `seed + i`, or with `seed[i]` when given one seed per game. """
+        self.rng.seed(seed)
+
+    def init(self, indices=None):
+        """ Starts a new game for the given environments (all by default). """
+        indices = self._envs if indices is None else np.asarray(indices)
+        if len(indices) == 0:
+            return
+
+        self.player_y[indices] = int((self._screen_height - PLAYER_HEIGHT) / 2)
+        self.player_vel_y[indices] = -9
+        self.player_rot[indices] = 45
+        self.player_idx[indices] = 0
+        self._player_idx_pos[indices] = 0
+        self._loop_iter[indices] = 0
+        self.base_x[indices] = 0
+        self.score[indices] = 0
+
+        self.n_pipes[indices] = 0
+        self._spawn_pipe(indices, self._screen_width + 200)
+        self._spawn_pipe(indices, self._screen_width + 200 + self._screen_width / 2)
+
+    def _spawn_pipe(self, indices, x):
+        """ Appends a pipe with a random gap at `x` to the given games. """
+        gap_range = int(self.base_y * 0.6 - self._pipe_gap_size)
+        gap_y = (self.rng.random(indices) * gap_range).astype(np.int64) + int(self.base_y * 0.2)
+
+        slots = self.n_pipes[indices]
+        self.pipe_x[indices, slots] = x
+        self.upper_y[indices, slots] = gap_y - PIPE_HEIGHT
+        self.lower_y[indices, slots] = gap_y + self._pipe_gap_size
+        self.n_pipes[indices] += 1
+
+    def check_crash(self):
+        """ Returns where the player collides with the ground (base) or a pipe. """
+        ground = self.player_y + PLAYER_HEIGHT >= self.base_y - 1
+
+        # Rectangles of the players, or of their opaque pixels when colliding pixel-perfect
+        player_x = self.player_x
+        player_y = self.player_y.astype(np.int64)[:, None]
+        if self._hitmasks is None:
+            width, height = PLAYER_WIDTH, PLAYER_HEIGHT
+        else:
+            player = self._hitmasks.player_index(self.player_idx, self.player_rot)
+            offset_y, offset_x, height, width = np.take(self._hitmasks.player_boxes, player, axis=0).T[:, :, None]
+            player_x = player_x + offset_x
+            player_y = player_y + offset_y
+
+        # Overlap of the (integer) rectangles of the player and of each pipe
+        pipe_x = self.pipe_x.astype(np.int64)
+        overlap_x = (player_x < pipe_x + PIPE_WIDTH) & (pipe_x < player_x + width)
+        upper = (player_y < self.upper_y + PIPE_HEIGHT) & (self.upper_y < player_y + height)
+        lower = (player_y < self.lower_y + PIPE_HEIGHT) & (self.lower_y < player_y + height)
+        valid = np.arange(MAX_PIPES) < self.n_pipes[:, None]
+        hit = valid & overlap_x & (upper | lower)
+
+        # The rectangles rarely overlap, so only those are checked pixel by pixel
+        if self._hitmasks is not None and hit.any():
+            envs, pipes = np.nonzero(hit)
+            hit[envs, pipes] = self._hitmasks.collides_batch(
+                self.player_x, self.player_y[envs], self.player_idx[envs], self.player_rot[envs],
+                self.pipe_x[envs, pipes], self.upper_y[envs, pipes], self.lower_y[envs, pipes])
+
+        return ground | hit.any(axis=1)
+
+    def step(self, actions):
+        """ Updates every game with the action taken by its player.
+
+        Returns the observations, rewards and terminations of the whole batch,
+        see :meth:`FlappyBirdSimpleGym.step`. Crashed games are left as they
+        were when crashing and are not reset here, see :meth:`init`.
+        """
+        actions = np.asarray(actions).reshape(self.num_envs)
+
+        flapped = (actions == 1) & (self.player_y > -2 * PLAYER_HEIGHT)
+        self.player_vel_y[flapped] = PLAYER_FLAP_ACC
+
+        crashed = self.check_crash()
+        alive = ~crashed
+        self._update(self._envs[alive], flapped[alive])
+
+        obs = self.observation()
+        reward = 1.0 + 1.0 / (np.abs(obs[:, 1]) + 1) ** 2
+
+        return obs, reward.astype(np.float32), crashed
+
+    def _update(self, indices, flapped):
+        """ Moves the players and the pipes of the given (alive) games one frame forward. """
+        n_pipes = self.n_pipes[indices]
+        valid = np.arange(MAX_PIPES) < n_pipes[:, None]
+
+        # Score when the middle of the player passes the middle of a pipe
+        player_mid_pos = self.player_x + PLAYER_WIDTH / 2
+        pipe_mid_pos = self.pipe_x[indices] + PIPE_WIDTH / 2
+        passed = valid & (pipe_mid_pos <= player_mid_pos) & (player_mid_pos < pipe_mid_pos + 4)
+        self.score[indices] += passed.sum(axis=1)
+
+        # Player's sprite and base
+        animate = indices[(self._loop_iter[indices] + 1) % 3 == 0]
+        self.player_idx[animate] = np.take(PLAYER_INDEX_CYCLE, self._player_idx_pos[animate])
+        self._player_idx_pos[animate] = (self._player_idx_pos[animate] + 1) % len(PLAYER_INDEX_CYCLE)
+        self._loop_iter[indices] = (self._loop_iter[indices] + 1) % 30
+        self.base_x[indices] = -((-self.base_x[indices] + 100) % self._base_shift)
+
+        # Player's rotation and movement
+        rot = self.player_rot[indices]
+        rot = np.where(rot > PLAYER_MIN_ROT, rot - PLAYER_VEL_ROT, rot)
+        self.player_rot[indices] = np.where(flapped, 45, rot)
+
+        vel_y = self.player_vel_y[indices]
+        vel_y = np.where((vel_y < PLAYER_MAX_VEL_Y) & ~flapped, vel_y + PLAYER_ACC_Y, vel_y)
+        self.player_vel_y[indices] = vel_y
+        player_y = self.player_y[indices]
+        self.player_y[indices] = player_y + np.minimum(vel_y, self.base_y - player_y - PLAYER_HEIGHT)
+
+        # Pipes move left, a new one spawns when the first is about to touch
+        # the left of the screen and the first leaves once out of the screen
+        self.pipe_x[indices] += np.where(valid, PIPE_VEL_X, 0)
+        first_x = self.pipe_x[indices, 0]
+        has_pipes = n_pipes > 0
+        self._spawn_pipe(indices[has_pipes & (0 < first_x) & (first_x < 5)], self._screen_width + 10)
+
+        leaving = indices[has_pipes & (first_x < -PIPE_WIDTH)]
+        for pipes in (self.pipe_x, self.upper_y, self.lower_y):
+            pipes[leaving, :-1] = pipes[leaving, 1:]
+        self.n_pipes[leaving] -= 1
+
+    def observation(self):
+        """ Distances from each player to the gap of the next pipe, see :meth:`FlappyBirdSimpleGym._get_observation`.
+
+        The buffer is reused by the next step.
+        """
+        h_dist = self.pipe_x + PIPE_WIDTH / 2 - (self.player_x - PLAYER_WIDTH / 2)
+        h_dist += 3  # extra distance to compensate for the buggy hit-box
+        valid = np.arange(MAX_PIPES) < self.n_pipes[:, None]
+
+        # First pipe ahead of the player, or the last one if all are behind
+        ahead = valid & (h_dist >= 0)
+        pipe = np.where(ahead.any(axis=1), ahead.argmax(axis=1), self.n_pipes - 1)
+
+        self.obs[:, 0] = h_dist[self._envs, pipe]
+        gap_y = (self.upper_y[self._envs, pipe] + PIPE_HEIGHT + self.lower_y[self._envs, pipe]) / 2
+        self.obs[:, 1] = gap_y - (self.player_y + PLAYER_HEIGHT / 2)
+
+        if self._normalize_obs:
+            self.obs /= (self._screen_width, self._screen_height)
+
+        return self.obs
+
+    def rgb_array(self):
+        """ RGB frames of every game, shaped ``(num_envs, height, width, 3)``. """
+        if self._renderer is None:
+            from gyms.FlappyBird.rgb_renderer import RgbRenderer
+
+            self._renderer = RgbRenderer((self._screen_width, self._screen_height))
+
+        frames = np.empty((self.num_envs, self._screen_height, self._screen_width, 3), dtype=np.uint8)
+        for i in range(self.num_envs):
+            n = self.n_pipes[i]
+            frames[i] = self._renderer.draw(self.player_x, self.player_y[i], self.player_rot[i], self.player_idx[i],
+                                            self.base_x[i], self.base_y, self.score[i],
+                                            zip(self.pipe_x[i, :n], self.upper_y[i, :n], self.lower_y[i, :n]))
+        return frames
+
+    def infos(self):
+        """ Step info of every game. """
+        return [{"score": score} for score in self.score.tolist()]
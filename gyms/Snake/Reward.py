@@ -1,82 +1,110 @@
-import wandb
+import numpy as np
+
+# Neighbours of a tile, used to find empty tiles closed in by the body
+GAP_KERNEL = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _count_gaps(tiles):
+    """ Number of empty inner tiles of one 2D window with body tiles on all four sides. """
+    rows = tiles.tolist()
+    gaps = 0
+    for above, row, below in zip(rows, rows[1:], rows[2:]):
+        for y in range(1, len(row) - 1):
+            if row[y] == 0 and above[y] == 1 and below[y] == 1 and row[y - 1] == 1 and row[y + 1] == 1:
+                gaps += 1
+    return gaps
 
 
 class Reward:
+    """ Reward shaping for Snake, computed for a batch of games at once.
 
-    def __init__(self, config):
+    Every argument of `calculate_reward` holds one entry per game and the
+    bookkeeping is kept per game. The value of each component of the last
+    reward is kept in `components`, keyed the way it is reported in the step
+    info. A single game goes through `calculate_single_reward` instead, the
+    same rules on plain Python numbers: array operations on one element cost
+    more than the rest of a step.
+    """
+
+    def __init__(self, config, num_envs=1):
         self.config = config
-        self.previous_food_distance = 0
-        self.steps_without_food = 0
+        self.previous_food_distance = np.zeros(num_envs, dtype=np.int64)
+        self.steps_without_food = np.zeros(num_envs, dtype=np.int64)
+        self.components = {}
 
-    def reset(self):
-        self.previous_food_distance = 0
-        self.steps_without_food = 0
+    def reset(self, indices=None):
+        indices = slice(None) if indices is None else indices
+        self.previous_food_distance[indices] = 0
+        self.steps_without_food[indices] = 0
 
-    def _calculate_food_distance_reward(self, head, food):
-        current_distance = abs(head.x - food.block.x) + abs(head.y - food.block.y)
+    def _calculate_food_distance_reward(self, head_x, head_y, food_x, food_y):
+        current_distance = np.abs(head_x - food_x) + np.abs(head_y - food_y)
         distance_change = self.previous_food_distance - current_distance
 
         reward_scaling_factor = 5
         reward = reward_scaling_factor * distance_change
 
-        self.previous_food_distance = current_distance
+        self.previous_food_distance[:] = current_distance
         return reward
 
-    def _calculate_death_penalty(self, dead, body):
-        if dead:
-            return self.config.get('death_penalty') * (len(body) / 4)
-
-        return 0
+    def _calculate_death_penalty(self, dead, body_length):
+        return np.where(dead, self.config.get('death_penalty') * (body_length / 4), 0)
 
     def _calculate_gap_penalty(self, tiles):
-        reward = 0
+        # Cross shaped convolution counting the body tiles around every inner tile
+        body = tiles == 1
+        size = tiles.shape[-1]
+        neighbours = sum(body[:, 1 + dx:size - 1 + dx, 1 + dy:size - 1 + dy] for dx, dy in GAP_KERNEL)
+        gaps = (tiles[:, 1:-1, 1:-1] == 0) & (neighbours == len(GAP_KERNEL))
 
-        for i in range(1, tiles.shape[0] - 1):
-            for j in range(1, tiles.shape[1] - 1):
-                if tiles[i, j] == 0 and tiles[i - 1, j] == 1 and tiles[i + 1, j] == 1 and tiles[i, j - 1] == 1 and \
-                        tiles[i, j + 1] == 1:
-                    reward -= 5  # Adjust pen
-
-        return reward
+        return -5 * gaps.sum(axis=(1, 2))  # Adjust pen
 
     def _calculate_food_reward(self, ate_food):
-        if ate_food:
-            return self.config.get('food_reward')
-
-        return 0
+        return np.where(ate_food, self.config.get('food_reward'), 0)
 
-    def _calculate_self_collision_penalty(self, head, body):
-        for block in body[:-1]:  # Excluding the tail, as it will move in the next step
-            if head == block:
-                return self.config.get('death_penalty', -10)  # default penalty of -10
-        return 0
+    def _calculate_self_collision_penalty(self, self_collision):
+        return np.where(self_collision, self.config.get('death_penalty', -10), 0)  # default penalty of -10
 
     def _calculate_living_penalty(self, ate_food):
-        if ate_food:
-            self.steps_without_food = 0
-        else:
-            self.steps_without_food += 1
+        self.steps_without_food[:] = np.where(ate_food, 0, self.steps_without_food + 1)
 
         return self.config.get("living_bonus") * self.steps_without_food
 
-    def calculate_reward(self, head, body, food, ate_food, tiles, dead):
-        food_reward = self._calculate_food_reward(ate_food)
-        food_distance_reward = self._calculate_food_distance_reward(head, food)
-        gap_penalty = self._calculate_gap_penalty(tiles)
-        death_penalty = self._calculate_death_penalty(dead, body)
-        collision_penalty = self._calculate_self_collision_penalty(head, body)
-        living_penalty = self._calculate_living_penalty(ate_food)
-
-        reward = food_reward + food_distance_reward + gap_penalty + death_penalty \
-            + collision_penalty + living_penalty
-
-        # if wandb.run is not None:
-        #     wandb.Table({
-        #         'reward/food_reward': food_reward,
-        #         'reward/food_distance_reward': food_distance_reward,
-        #         'reward/death_penalty': death_penalty,
-        #         'reward/gap_penalty': gap_penalty,
-        #         'reward/total': reward
-        #     })
-
-        return reward
+    def calculate_reward(self, head_x, head_y, food_x, food_y, body_length, ate_food, tiles, dead,
+                         self_collision):
+        self.components = {
+            'reward/food_reward': self._calculate_food_reward(ate_food),
+            'reward/food_distance_reward': self._calculate_food_distance_reward(head_x, head_y, food_x, food_y),
+            'reward/gap_penalty': self._calculate_gap_penalty(tiles),
+            'reward/death_penalty': self._calculate_death_penalty(dead, body_length),
+            'reward/collision_penalty': self._calculate_self_collision_penalty(self_collision),
+            'reward/living_penalty': self._calculate_living_penalty(ate_food),
+        }
+
+        return sum(self.components.values())
+
+    def calculate_single_reward(self, head_x, head_y, food_x, food_y, body_length, ate_food, tiles, dead,
+                                self_collision):
+        """ `calculate_reward` of a single game, from scalars and one 2D `tiles` window. Returns a float. """
+        current_distance = abs(head_x - food_x) + abs(head_y - food_y)
+        distance_change = int(self.previous_food_distance[0]) - current_distance
+        self.previous_food_distance[0] = current_distance
+
+        steps_without_food = 0 if ate_food else int(self.steps_without_food[0]) + 1
+        self.steps_without_food[0] = steps_without_food
+
+        self.components = {
+            'reward/food_reward': float(self.config.get('food_reward')) if ate_food else 0.0,
+            'reward/food_distance_reward': 5.0 * distance_change,
+            'reward/gap_penalty': -5.0 * _count_gaps(tiles),
+            'reward/death_penalty': self.config.get('death_penalty') * (body_length / 4) if dead else 0.0,
+            'reward/collision_penalty': float(self.config.get('death_penalty', -10)) if self_collision else 0.0,
+            'reward/living_penalty': float(self.config.get("living_bonus") * steps_without_food),
+        }
+
+        return sum(self.components.values())
+
+    def info(self, index=0):
+        """ Components of the last reward of one game, as plain floats. """
+        return {name: value if isinstance(value, float) else float(value[index])
+                for name, value in self.components.items()}
@@ -1,25 +1,49 @@
 import gymnasium as gym
+import numpy as np
 from gymnasium import spaces
 from gyms.Snake.game_logic import Snake
+from gyms.utils import repeat_action
+
+
+def observation_space(snake):
+    """ Space of the observations of a `Snake` (or of each game of a `VecSnake`). """
+    if snake.obs_mode == "grid":
+        return spaces.Box(0, 255, shape=snake.observation_shape, dtype=np.uint8)
+    if snake.obs_mode == "window":
+        return spaces.Box(-1, 2, shape=snake.observation_shape, dtype=np.float32)
+    return spaces.Box(-1, 3, shape=snake.observation_shape, dtype=np.float32)
 
 
 class SnakeGym(gym.Env):
-    metadata = {"render_modes": ["human"], "render_fps": 30}
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 30}
+
+    def __init__(self, render_mode=None, action_repeat=1, max_pool_obs=False, **kwargs) -> None:
+        if action_repeat < 1:
+            raise ValueError(f"Actions must be repeated at least once, got {action_repeat}")
 
-    def __init__(self, render_mode=None, **kwargs) -> None:
         self.render_mode = render_mode
+        # Frames played per step, see `repeat_action`
+        self.action_repeat = action_repeat
+        self.max_pool_obs = max_pool_obs
         self.action_space = spaces.Discrete(4)
         self.snake = Snake(**kwargs)
-        self.observation_space = spaces.Box(
-            float("-inf"), float("inf"), shape=(self.snake.blocks_x * self.snake.blocks_y + 1 + 2 + 4,))
+        self.observation_space = observation_space(self.snake)
 
     def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self.snake.seed(seed)
         self.snake.init()
         if self.render_mode == "human":
             self._render_frame()
         return self.get_obs(), self._get_info()
 
     def step(self, action):
+        if self.action_repeat == 1:
+            return self._step_frame(action)
+        return repeat_action(self._step_frame, action, self.action_repeat, self.max_pool_obs)
+
+    def _step_frame(self, action):
         s, r, d, t = self.snake.step(action)
         if self.render_mode == "human":
             self._render_frame()
@@ -38,6 +62,8 @@ class SnakeGym(gym.Env):
         self.snake.close()
 
     def render(self):
+        if self.render_mode == "rgb_array":
+            return self.snake.rgb_array().copy()
         self.snake.render()
 
     def play(self):
@@ -0,0 +1,74 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from gyms.Snake.SnakeGym import observation_space
+from gyms.Snake.vec_game_logic import VecSnake
+
+
+class SnakeVecEnv(VecEnv):
+    """ Stable Baselines 3 `VecEnv` running every Snake board in this process.
+
+    Unlike wrapping one `SnakeGym` per `SubprocVecEnv` worker, all boards are
+    stepped by a single `VecSnake`, so there is no pickling, IPC or per-env
+    Python overhead. Finished boards are reset automatically, with their last
+    observation stored under ``terminal_observation`` like the SB3 envs do.
+    """
+
+    def __init__(self, num_envs, render_mode=None, **kwargs) -> None:
+        self.render_mode = render_mode
+        self.snake = VecSnake(num_envs, **kwargs)
+        self._actions = None
+
+        super().__init__(
+            num_envs,
+            observation_space(self.snake),
+            spaces.Discrete(4)
+        )
+
+    def reset(self):
+        if all(seed is not None for seed in self._seeds):
+            self.snake.seed(self._seeds)
+        self._reset_seeds()
+
+        self.snake.init()
+        return self.snake.observation().copy()
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated = self.snake.step(self._actions)
+        dones = terminated | truncated
+
+        infos = self.snake.infos()
+        done_indices = np.flatnonzero(dones)
+        for i in done_indices:
+            infos[i]["terminal_observation"] = obs[i].copy()
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+
+        if len(done_indices):
+            self.snake.init(done_indices)
+            obs = self.snake.observation()
+
+        return obs.copy(), rewards, dones, infos
+
+    def get_images(self):
+        if self.render_mode != "rgb_array":
+            return [None for _ in range(self.num_envs)]
+        return list(self.snake.rgb_array())
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [getattr(self, method_name)(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
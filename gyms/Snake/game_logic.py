@@ -1,7 +1,12 @@
 import numpy as np
 
 from gyms.Snake.Reward import Reward
+from gyms.Snake.renderer import RgbRenderer
 from gyms.Snake.utils import *
+from gyms.utils import get_rng_state, set_rng_state
+
+# Scalars at the front of a `Snake.get_state` snapshot
+_STATE_HEADER = 12
 
 
 class Snake:
@@ -16,6 +21,9 @@ class Snake:
             death_penalty=-1.0,
             width=40,
             height=40,
+            obs_mode="flat",
+            window_size=5,
+            cycle_detection=None,
             block_size=20,
             background_color=Color.orange,
             food_color=Color.red,
@@ -34,16 +42,43 @@ class Snake:
         self.death_penalty = death_penalty
         self.blocks_x = width
         self.blocks_y = height
+        if obs_mode not in OBS_MODES:
+            raise ValueError(f"Unknown observation mode {obs_mode!r}, expected one of {OBS_MODES}")
+        self.obs_mode = obs_mode
+        self.window_size = window_size
+        if cycle_detection is not None and cycle_detection not in CYCLE_DETECTION_MODES:
+            raise ValueError(f"Unknown cycle detection {cycle_detection!r}, expected one of {CYCLE_DETECTION_MODES}")
+        self.cycle_detection = cycle_detection
         self.food_color = food_color
         self.head_color = head_color
         self.body_color = body_color
         self.background_color = background_color
         self.food = Food(self.blocks_x, self.blocks_y, food_color)
+        self.free_cells = FreeCells(self.blocks_x, self.blocks_y)
+        self.np_random = np.random.default_rng()
         Block.size = block_size
 
+        # Cells of the board, with a wall border wide enough for the windows
+        # around a head that just left the board
+        self._pad = max(5, window_size) // 2 + 1
+        self._grid = np.full((width + 2 * self._pad, height + 2 * self._pad), Tile.wall, dtype=np.int8)
+        self._cells = self._grid[self._pad:-self._pad, self._pad:-self._pad]
+
+        # Body blocks from tail to neck, as a ring buffer of coordinates
+        self._ring = np.zeros((width * height, 2), dtype=np.int64)
+        self._tail = 0
+        self._length = 0
+
+        # Zobrist hash of the board and the hashes seen since the last food
+        self._zobrist_keys = zobrist_keys(width * height)
+        self._zobrist = self._zobrist_keys.tolist()
+        self.state_hash = 0
+        self._visited = set()
+
         self.map = None
         self.screen = None
         self.clock = None
+        self._rgb_renderer = None
         self.human_playing = False
 
         self.reward = Reward({
@@ -53,22 +88,134 @@ class Snake:
             "living_bonus": living_bonus
         })
 
+    def seed(self, seed=None):
+        self.np_random = np.random.default_rng(seed)
+
     def init(self):
         self.episode += 1
+        x, y = self.blocks_x // 2, self.blocks_y // 2
+        self.lay_out([(x + i, y) for i in range(-self.init_length, 0)], (x, y), direction=3)
+
+    def lay_out(self, body, head, direction):
+        """ Starts the episode over with the body blocks at `body`, from tail to
+        neck, and the head at `head` moving in `direction`. The food is placed
+        on a random free cell.
+        """
+        cells = [*map(tuple, body), tuple(head)]
+        if len(set(cells)) != len(cells):
+            raise ValueError("The body and the head have to be on distinct cells")
+        if not all(0 <= x < self.blocks_x and 0 <= y < self.blocks_y for x, y in cells):
+            raise ValueError(f"The body and the head have to be on the {self.blocks_x}x{self.blocks_y} board")
+
         self.score = 0
-        self.direction = 3
+        self.direction = direction
         self.current_step = 0
-        self.head = Block(self.blocks_x // 2, self.blocks_y // 2, self.head_color)
-        self.body = [self.head.copy(i, 0, self.body_color)
-                     for i in range(-self.init_length, 0)]
-        self.blocks = [self.food.block, self.head, *self.body]
-        self.food.new_food(self.blocks)
+        self.head = Block(*cells[-1], self.head_color)
+
+        self._new_observation()
+        self._cells[:] = Tile.empty
+        self.free_cells.reset()
+        self.state_hash = 0
+
+        self._tail = 0
+        self._length = 0
+        for x, y in cells[:-1]:
+            self.grow(x, y)
+        self._paint(self.head.x, self.head.y, Tile.head)
 
+        self.food.new_food(self.free_cells, self.np_random)
+        self._paint(self.food.block.x, self.food.block.y, Tile.food)
+
+        self._visited.clear()
+        self._visit()
         self.reward.reset()
 
+    def _new_observation(self):
+        # A new buffer per episode, so the last observation of the previous
+        # episode is not overwritten by the first one of this episode
+        self._obs = np.zeros(self.observation_shape, dtype=OBS_DTYPES[self.obs_mode])
+        if self.obs_mode == "flat":
+            self._board = self._obs[:self.blocks_x * self.blocks_y].reshape(self.blocks_x, self.blocks_y)
+        elif self.obs_mode == "grid":
+            self._board = self._obs
+
+    def get_state(self):
+        """ Snapshot of the game, including the food RNG, to branch from with `set_state`.
+
+        The snapshot is an immutable `bytes` string of the scalars, the random
+        generator state, the board, the body (tail to neck), the free cells
+        in their sampling order and the boards seen by the cycle detection, so
+        a restored game plays out exactly like the original one.
+        """
+        header = np.array([
+            self.episode, self.score, self.direction, self.current_step,
+            self.head.x, self.head.y, self.food.block.x, self.food.block.y,
+            self._length, len(self.free_cells),
+            self.reward.previous_food_distance[0], self.reward.steps_without_food[0]
+        ], dtype=np.int64)
+        body = self._ring[(self._tail + np.arange(self._length)) % len(self._ring)]
+
+        return b"".join((header.tobytes(), get_rng_state(self.np_random).tobytes(), self._cells.tobytes(),
+                         body.tobytes(), self.free_cells.cells[:len(self.free_cells)].tobytes(),
+                         np.array(sorted(self._visited), dtype=np.uint64).tobytes()))
+
+    def set_state(self, state):
+        """ Restores a snapshot taken by `get_state` on a game of the same size. """
+        header = np.frombuffer(state, np.int64, _STATE_HEADER)
+        (self.episode, self.score, self.direction, self.current_step,
+         head_x, head_y, food_x, food_y, self._length, free_count,
+         previous_food_distance, steps_without_food) = header.tolist()
+        offset = header.nbytes
+
+        rng_words = np.frombuffer(state, np.uint64, 6, offset)
+        set_rng_state(self.np_random, rng_words)
+        offset += rng_words.nbytes
+
+        cells = np.frombuffer(state, np.int8, self.blocks_x * self.blocks_y, offset)
+        self._cells[:] = cells.reshape(self.blocks_x, self.blocks_y)
+        offset += cells.nbytes
+
+        body = np.frombuffer(state, np.int64, 2 * self._length, offset)
+        self._ring[:self._length] = body.reshape(-1, 2)
+        self._tail = 0
+        offset += body.nbytes
+
+        free = self.free_cells
+        free.cells[:free_count] = np.frombuffer(state, np.int64, free_count, offset)
+        free.positions[free.cells[:free_count]] = np.arange(free_count)
+        free.count = free_count
+        offset += 8 * free_count
+
+        self._visited = set(np.frombuffer(state, np.uint64, offset=offset).tolist())
+        self.state_hash = int(np.bitwise_xor.reduce(self._zobrist_keys[self._cells.ravel(), np.arange(cells.size)]))
+
+        self.head = Block(head_x, head_y, self.head_color)
+        self.food.block.move_to(food_x, food_y)
+        self.reward.previous_food_distance[0] = previous_food_distance
+        self.reward.steps_without_food[0] = steps_without_food
+
+        self._new_observation()
+        if self.obs_mode == "flat":
+            self._board[:] = self._cells
+        elif self.obs_mode == "grid":
+            for tile, channel in GRID_CHANNELS.items():
+                self._board[channel][self._cells == tile] = 255
+
+    @property
+    def body(self):
+        """ Body blocks from tail to neck, built on demand for drawing. """
+        indices = (self._tail + np.arange(self._length)) % len(self._ring)
+        return [Block(x, y, self.body_color) for x, y in self._ring[indices].tolist()]
+
+    @property
+    def blocks(self):
+        return [self.food.block, self.head, *self.body]
+
     def close(self):
-        pygame.quit()
-        pygame.display.quit()
+        if self.screen is not None or self.human_playing:
+            import pygame
+            pygame.quit()
+            pygame.display.quit()
         self.screen = None
         self.clock = None
 
@@ -80,20 +227,21 @@ class Snake:
         update_screen(self.screen, self)
         handle_input()
 
+    def rgb_array(self):
+        """ The board as an RGB frame painted with NumPy, reused by the next call. """
+        if self._rgb_renderer is None:
+            self._rgb_renderer = RgbRenderer(Block.size, self.background_color, self.body_color,
+                                             self.food_color, self.head_color)
+        return self._rgb_renderer.render(self._cells)
+
     def get_surrounding_tiles(self, window_size=3):
-        # We'll check a window around the snake's head
-        tiles = np.zeros((window_size, window_size), dtype=int)
-
-        for i in range(-window_size // 2, window_size // 2 + 1):
-            for j in range(-window_size // 2, window_size // 2 + 1):
-                x, y = self.head.x + i, self.head.y + j
-
-                if x < 0 or x >= self.blocks_x or y < 0 or y >= self.blocks_y:
-                    tiles[i + window_size // 2, j + window_size // 2] = -1  # Wall
-                elif (x, y) in [(block.x, block.y) for block in self.body]:
-                    tiles[i + window_size // 2, j + window_size // 2] = 1  # Snake's body
-                elif x == self.food.block.x and y == self.food.block.y:
-                    tiles[i + window_size // 2, j + window_size // 2] = 2  # Food
+        # We'll check a window around the snake's head: -1 wall, 1 body, 2 food
+        x, y = self.head.x + self._pad, self.head.y + self._pad
+        r = window_size // 2
+        tiles = self._grid[x - r:x + r + 1, y - r:y + r + 1].astype(int)
+
+        # The head is not part of the body
+        tiles[tiles == Tile.head] = Tile.empty
         return tiles
 
     def step(self, direction):
@@ -114,58 +262,99 @@ class Snake:
 
         self.head.x += step[0]
         self.head.y += step[1]
+        body_length = self._length
 
         dead = False
+        won = False
+        self_collision = False
 
-        if self.head == self.food.block:
+        target = self._grid[self.head.x + self._pad, self.head.y + self._pad]
+        if target == Tile.food:
             self.score += 1
             self.grow(x, y)
-            self.food.new_food(self.blocks)
+            self._paint(self.head.x, self.head.y, Tile.head)
+            won = not self.food.new_food(self.free_cells, self.np_random)
+            if not won:
+                self._paint(self.food.block.x, self.food.block.y, Tile.food)
             ate_food = True
         else:
+            # The tail leaves its cell before the head arrives
             self.move(x, y)
-            for block in self.body:
-                if self.head == block:
-                    dead = True
-            if self.head.x >= self.blocks_x or self.head.x < 0 or self.head.y < 0 or self.head.y >= self.blocks_x:
-                dead = True
+            target = self._grid[self.head.x + self._pad, self.head.y + self._pad]
+            self_collision = target == Tile.body
+            dead = self_collision or target == Tile.wall
+            if self_collision:
+                # Only shown in the observation, the board keeps the body cell
+                self._paint_observation(self.head.x, self.head.y, Tile.head)
+            elif not dead:
+                self._paint(self.head.x, self.head.y, Tile.head)
+
+        cycle = False
+        if self.cycle_detection is not None and not dead:
+            if ate_food:
+                self._visited.clear()
+            cycle = self._visit()
 
         # Get surrounding tiles
         tiles = self.get_surrounding_tiles(5)
 
-        return self.observation(dead), self.reward.calculate_reward(self.head, self.body, self.food, ate_food, tiles, dead), dead, truncated
+        reward = self.reward.calculate_single_reward(self.head.x, self.head.y, self.food.block.x, self.food.block.y,
+                                                     body_length, ate_food, tiles, dead, self_collision)
+
+        terminated = dead or won or (cycle and self.cycle_detection == "terminate")
+        truncated = truncated or (cycle and self.cycle_detection == "truncate")
+        return self.observation(dead), reward, terminated, truncated
+
+    def _visit(self):
+        """ Remembers the current board, returns True if it was already seen since the last food. """
+        if len(self._visited) >= MAX_VISITED_STATES:
+            self._visited.clear()
+        if self.state_hash in self._visited:
+            return True
+
+        self._visited.add(self.state_hash)
+        return False
+
+    def _paint(self, x, y, tile):
+        """ Writes a cell of the board and of the flattened board in the observation. """
+        covered = tile == Tile.body or tile == Tile.head
+        if covered != (self._cells[x, y] == Tile.body or self._cells[x, y] == Tile.head):
+            if covered:
+                self.free_cells.remove(x, y)
+            else:
+                self.free_cells.add(x, y)
+
+        cell = x * self.blocks_y + y
+        self.state_hash ^= self._zobrist[self._cells[x, y]][cell] ^ self._zobrist[tile][cell]
+        self._cells[x, y] = tile
+        self._paint_observation(x, y, tile)
+
+    def _paint_observation(self, x, y, tile):
+        if self.obs_mode == "flat":
+            self._board[x, y] = tile
+        elif self.obs_mode == "grid":
+            self._board[:, x, y] = 0
+            if tile != Tile.empty:
+                self._board[GRID_CHANNELS[tile], x, y] = 255
+
+    @property
+    def observation_shape(self):
+        if self.obs_mode == "window":
+            return (self.window_size * self.window_size + 4 + 2,)
+        if self.obs_mode == "grid":
+            return (len(GRID_CHANNELS), self.blocks_x, self.blocks_y)
+        return (self.blocks_x * self.blocks_y + 4 + 3,)
 
     def get_board_state(self):
-        board_state = np.zeros((self.blocks_x, self.blocks_y), dtype=np.int32)
-
-        # Food
-        fx, fy = self.food.block.x, self.food.block.y
-        if 0 <= fx < self.blocks_x and 0 <= fy < self.blocks_y:
-            board_state[fx][fy] = 2
-
-        # Snake body
-        for block in self.body:
-            bx, by = block.x, block.y
-            if 0 <= bx < self.blocks_x and 0 <= by < self.blocks_y:
-                board_state[bx][by] = 1
-
-        # Snake head
-        hx, hy = self.head.x, self.head.y
-        if 0 <= hx < self.blocks_x and 0 <= hy < self.blocks_y:
-            board_state[hx][hy] = 3
-
-        # Flatten the board state
-        flattened_board = board_state.flatten()
-
-        # Snake's Direction as one-hot encoded vector
-        # Assuming self.direction is between 0 and 3, representing Up, Down, Left, Right
-        direction_vector = [0, 0, 0, 0]
-        direction_vector[self.direction] = 1
+        """ Flattened board (food 2, body 1, head 3) followed by the one-hot direction.
 
-        # Combine the flattened board state with the direction vector
-        observation = np.concatenate([flattened_board, direction_vector])
+        This is a view into the "flat" observation buffer, kept up to date by `step`.
+        """
+        direction_vector = self._obs[self.blocks_x * self.blocks_y:-3]
+        direction_vector[:] = 0
+        direction_vector[self.direction] = 1
 
-        return observation
+        return self._obs[:-3]
 
     def direction_to_vector(self, direction):
         # Define a mapping from directions to vectors
@@ -179,6 +368,25 @@ class Snake:
         return direction_mapping[direction]
 
     def observation(self, dead=False):
+        """ Observation in the configured mode, in a buffer updated in place by the next step.
+
+        * "flat": flattened board, one-hot direction, food distance and direction vector.
+        * "window": tiles of the `window_size` window around the head, one-hot
+          direction and the offset to the food relative to the board size.
+        * "grid": uint8 board with a body, food and head channel, for `CnnPolicy`.
+        """
+        if self.obs_mode == "grid":
+            return self._obs
+
+        if self.obs_mode == "window":
+            size = self.window_size * self.window_size
+            self._obs[:size] = self.get_surrounding_tiles(self.window_size).ravel()
+            self._obs[size:size + 4] = 0
+            self._obs[size + self.direction] = 1
+            self._obs[-2:] = ((self.food.block.x - self.head.x) / self.blocks_x,
+                              (self.food.block.y - self.head.y) / self.blocks_y)
+            return self._obs
+
         dx = self.head.x - self.food.block.x
         dy = self.head.y - self.food.block.y
 
@@ -187,11 +395,12 @@ class Snake:
         distance_to_food = (abs(dx) + abs(dy)) / max_distance
         d1, d2 = self.direction_to_vector(int(self.direction))
 
-        # Board state
-        board_state = self.get_board_state()
+        # Board state, followed by the food distance and direction, all in the
+        # same buffer which is updated in place by the next step
+        self.get_board_state()
+        self._obs[-3:] = distance_to_food, d1, d2
 
-        # Concatenate all observations
-        return np.concatenate([board_state, [distance_to_food, d1, d2]])
+        return self._obs
 
     def calc_distance(self, dead):
         if dead:
@@ -229,23 +438,30 @@ class Snake:
         return (self.dist_reward - d) / self.dist_reward
 
     def grow(self, x, y):
-        body = Block(x, y, Color.blue)
-        self.blocks.append(body)
-        self.body.append(body)
+        """ Adds a body block at (x, y), behind the head. """
+        self._ring[(self._tail + self._length) % len(self._ring)] = x, y
+        self._length += 1
+        self._paint(x, y, Tile.body)
 
     def move(self, x, y):
-        tail = self.body.pop(0)
-        tail.move_to(x, y)
-        self.body.append(tail)
+        """ Moves the tail block to (x, y), behind the head. """
+        tail_x, tail_y = self._ring[self._tail]
+        self._paint(tail_x, tail_y, Tile.empty)
+        self._tail = (self._tail + 1) % len(self._ring)
+        self._length -= 1
+        self.grow(x, y)
 
     def info(self):
         return {
             'head': (self.head.x, self.head.y),
             'food': (self.food.block.x, self.food.block.y),
             # 'map': self.map.T
+            **self.reward.info()
         }
 
     def play(self, fps=10, acceleration=True, step=1, frep=10):
+        import pygame
+
         self.max_step = 99999
         self.fps = fps
         self.food_reward = 1
@@ -0,0 +1,37 @@
+import numpy as np
+
+from gyms.Snake.utils import Color
+
+
+class RgbRenderer:
+    """ Paints Snake boards into RGB frames with NumPy, without pygame.
+
+    Boards are given as arrays of tile codes indexed ``[x, y]`` (see `Tile`),
+    either a single board or a batch of them. Each tile becomes a
+    `block_size` square of its color in a frame buffer that is reused by the
+    next call, so copy the frames to keep them.
+    """
+
+    def __init__(self, block_size=20, background_color=Color.orange, body_color=Color.blue,
+                 food_color=Color.red, head_color=Color.purple) -> None:
+        self.block_size = block_size
+        # Indexed by tile code: empty, body, food, head
+        self.palette = np.array([background_color, body_color, food_color, head_color], dtype=np.uint8)
+        self._frames = None
+
+    def render(self, cells):
+        """ Returns the frame of each board, shaped ``(..., height, width, 3)``. """
+        cells = np.asarray(cells)
+        batch_shape, (blocks_x, blocks_y) = cells.shape[:-2], cells.shape[-2:]
+        size = self.block_size
+
+        shape = (*batch_shape, blocks_y * size, blocks_x * size, 3)
+        if self._frames is None or self._frames.shape != shape:
+            self._frames = np.empty(shape, dtype=np.uint8)
+
+        # Rows of the image are the y axis of the board
+        colors = self.palette[np.swapaxes(cells, -1, -2)]
+        blocks = self._frames.reshape(*batch_shape, blocks_y, size, blocks_x, size, 3)
+        blocks[...] = colors[..., :, None, :, None, :]
+
+        return self._frames
@@ -1,7 +1,6 @@
-import pygame
 import math
 
-from random import randint
+import numpy as np
 
 
 class Food:
@@ -10,19 +9,51 @@ class Food:
         self.blocks_y = blocks_y
         self.block = Block(0, 0, color)
 
-    def new_food(self, blocks):
-        (x, y) = (randint(0, self.blocks_x-1), randint(0, self.blocks_y-1))
-        done = False
+    def new_food(self, free_cells, rng):
+        """ Moves the food to a random free cell, returns False if there is none left. """
+        if len(free_cells) == 0:
+            return False
 
-        while not done:
-            done = True
-            for block in blocks:
-                if (x, y) == (block.x, block.y):
-                    (x, y) = (randint(0, self.blocks_x-1),
-                              randint(0, self.blocks_y-1))
-                    done = False
-                    break
-        self.block.move_to(x, y)
+        self.block.move_to(*free_cells.sample(rng))
+        return True
+
+
+class FreeCells:
+    """ Cells not covered by the snake, with constant time add, remove and sampling.
+
+    The free cells are packed at the front of `cells` and `positions` maps
+    every cell to its index there, so removing one swaps it with the last.
+    """
+
+    def __init__(self, blocks_x, blocks_y) -> None:
+        self.blocks_y = blocks_y
+        self.cells = np.arange(blocks_x * blocks_y)
+        self.positions = np.arange(blocks_x * blocks_y)
+        self.count = len(self.cells)
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        self.cells[:] = self.positions[:] = np.arange(len(self.cells))
+        self.count = len(self.cells)
+
+    def add(self, x, y):
+        cell = x * self.blocks_y + y
+        self.cells[self.count] = cell
+        self.positions[cell] = self.count
+        self.count += 1
+
+    def remove(self, x, y):
+        cell = x * self.blocks_y + y
+        position, last = self.positions[cell], self.cells[self.count - 1]
+        self.cells[position] = last
+        self.positions[last] = position
+        self.count -= 1
+
+    def sample(self, rng):
+        cell = int(self.cells[rng.integers(self.count)])
+        return cell // self.blocks_y, cell % self.blocks_y
 
 
 class Block:
@@ -58,6 +89,41 @@ class Color:
     purple = (197, 90, 255)
 
 
+class Tile:
+    empty = 0
+    body = 1
+    food = 2
+    head = 3
+    wall = -1
+
+
+# Observation encodings of the board, and the dtype of each
+OBS_MODES = ("flat", "window", "grid")
+OBS_DTYPES = {"flat": np.float32, "window": np.float32, "grid": np.uint8}
+
+# Channel of each tile in the "grid" observation
+GRID_CHANNELS = {Tile.body: 0, Tile.food: 1, Tile.head: 2}
+
+# What to do with an episode that repeats a board without eating in between
+CYCLE_DETECTION_MODES = ("truncate", "terminate")
+
+# Boards remembered per episode for cycle detection, older ones are forgotten past it
+MAX_VISITED_STATES = 1 << 14
+
+
+def zobrist_keys(cells, seed=0):
+    """ Random 64 bit key of every tile code on every cell, for Zobrist hashing of boards.
+
+    A board hashes to the XOR of the keys of its cells, so painting a cell
+    updates the hash in constant time. Empty cells have key 0. The keys are
+    indexed ``[tile, x * height + y]`` and are the same for every game.
+    """
+    keys = np.random.default_rng(seed).integers(1, np.iinfo(np.uint64).max, size=(4, cells),
+                                                 dtype=np.uint64, endpoint=True)
+    keys[Tile.empty] = 0
+    return keys
+
+
 class Direction:
     up = (0, -1)
     down = (0, 1)
@@ -83,6 +149,7 @@ def normalize(x, y):
 
 
 def handle_input():
+    import pygame
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             pygame.display.quit()
@@ -110,6 +177,7 @@ def handle_input():
 
 
 def update_screen(screen, snake, human_playing=False):
+    import pygame
     if not pygame.display.get_init():
         return
     width = screen.get_width()
@@ -136,6 +204,7 @@ def update_screen(screen, snake, human_playing=False):
 
 
 def game_start(width, height, score_board=40):
+    import pygame
     pygame.init()
     pygame.display.set_caption('Snake')
     clock = pygame.time.Clock()
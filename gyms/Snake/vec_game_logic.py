@@ -0,0 +1,365 @@
+import numpy as np
+
+from gyms.Snake.Reward import Reward
+from gyms.Snake.renderer import RgbRenderer
+from gyms.Snake.utils import CYCLE_DETECTION_MODES, GRID_CHANNELS, MAX_VISITED_STATES, OBS_DTYPES, OBS_MODES, \
+    Tile, zobrist_keys
+from gyms.utils import BatchRandom
+
+# Up, Down, Left, Right, indexed by direction
+STEP_X = np.array([0, 0, -1, 1])
+STEP_Y = np.array([-1, 1, 0, 0])
+
+
+class VecSnake:
+    """ Steps `num_envs` games of Snake at once.
+
+    Each game is stored as rows of shared arrays instead of `Block` objects:
+
+    * ``board`` holds the codes of every cell, padded with a wall border so
+      that windows around the head never need bounds checks.
+    * ``ring`` holds the cells of the snake (tail to head) as a ring buffer
+      indexed by ``head_ptr`` and ``length``.
+    * ``free`` packs the cells not covered by the snake at the front of each
+      row, ``free_pos`` maps cells to their index there and ``n_free`` counts
+      them, so food is placed in constant time.
+
+    Every game draws from its own random stream (see `BatchRandom`), so a
+    game's food does not depend on the other games.
+
+    With `cycle_detection`, the Zobrist hash of every board is kept in
+    ``state_hash`` and the hashes seen since the last food in ``visited``, an
+    open addressing hash table per game (0 marks an empty slot).
+
+    Moving, eating, dying, rewarding and resetting are all done with array
+    operations over the whole batch. The rules and the reward match `Snake`.
+    """
+
+    def __init__(
+            self,
+            num_envs,
+            fps=60,
+            max_step=500,
+            init_length=4,
+            food_reward=2.0,
+            dist_reward=None,
+            living_bonus=0.0,
+            death_penalty=-1.0,
+            width=40,
+            height=40,
+            obs_mode="flat",
+            window_size=5,
+            cycle_detection=None,
+            block_size=20,
+            seed=None,
+    ) -> None:
+        self.num_envs = num_envs
+        self.fps = fps
+        self.max_step = max_step
+        self.init_length = min(init_length, width // 2)
+        self.blocks_x = width
+        self.blocks_y = height
+        self.cells = width * height
+        if obs_mode not in OBS_MODES:
+            raise ValueError(f"Unknown observation mode {obs_mode!r}, expected one of {OBS_MODES}")
+        self.obs_mode = obs_mode
+        self.window_size = window_size
+        if cycle_detection is not None and cycle_detection not in CYCLE_DETECTION_MODES:
+            raise ValueError(f"Unknown cycle detection {cycle_detection!r}, expected one of {CYCLE_DETECTION_MODES}")
+        self.cycle_detection = cycle_detection
+
+        # The reward (5x5) and the observation look at windows around the head,
+        # which may itself be one block outside the board after hitting a wall
+        self.pad = max(5, window_size) // 2 + 1
+
+        self._envs = np.arange(num_envs)
+        self.rng = BatchRandom(num_envs, seed)
+
+        self.board = np.full((num_envs, width + 2 * self.pad, height + 2 * self.pad), Tile.wall, dtype=np.int8)
+        self.interior = self.board[:, self.pad:-self.pad, self.pad:-self.pad]
+        self.ring = np.zeros((num_envs, self.cells), dtype=np.int32)
+        self.head_ptr = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int64)
+        self.free = np.zeros((num_envs, self.cells), dtype=np.int64)
+        self.free_pos = np.zeros((num_envs, self.cells), dtype=np.int64)
+        self.n_free = np.zeros(num_envs, dtype=np.int64)
+        self.head_x = np.zeros(num_envs, dtype=np.int64)
+        self.head_y = np.zeros(num_envs, dtype=np.int64)
+        self.food_x = np.zeros(num_envs, dtype=np.int64)
+        self.food_y = np.zeros(num_envs, dtype=np.int64)
+        self.direction = np.zeros(num_envs, dtype=np.int64)
+        self.current_step = np.zeros(num_envs, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.episode = np.zeros(num_envs, dtype=np.int64)
+
+        self.zobrist = zobrist_keys(self.cells)
+        self.state_hash = np.zeros(num_envs, dtype=np.uint64)
+        # At most 3/4 full, as the history is forgotten past MAX_VISITED_STATES
+        capacity = 1 << int(np.ceil(np.log2(min(max_step + 1, MAX_VISITED_STATES) * 4 / 3)))
+        self.visited = np.zeros((num_envs, capacity if cycle_detection else 0), dtype=np.uint64)
+        self.n_visited = np.zeros(num_envs, dtype=np.int64)
+
+        self.obs = np.zeros((num_envs, *self.observation_shape), dtype=OBS_DTYPES[obs_mode])
+        self.renderer = RgbRenderer(block_size)
+
+        self.reward = Reward({
+            "food_reward": food_reward,
+            "dist_reward": dist_reward,
+            "death_penalty": death_penalty,
+            "living_bonus": living_bonus
+        }, num_envs)
+
+    @property
+    def observation_shape(self):
+        """ Shape of the observation of a single game. """
+        if self.obs_mode == "window":
+            return (self.window_size * self.window_size + 4 + 2,)
+        if self.obs_mode == "grid":
+            return (len(GRID_CHANNELS), self.blocks_x, self.blocks_y)
+        return (self.cells + 4 + 3,)
+
+    def seed(self, seed=None):
+        """ Seeds game `i` with `seed + i`, or with `seed[i]` when given one seed per game. """
+        self.rng.seed(seed)
+
+    def _occupy(self, indices, cells):
+        """ Removes one cell per given game from the free cells, swapping in the last free one. """
+        positions = self.free_pos[indices, cells]
+        last = self.free[indices, self.n_free[indices] - 1]
+        self.free[indices, positions] = last
+        self.free_pos[indices, last] = positions
+        self.n_free[indices] -= 1
+
+    def _release(self, indices, cells):
+        """ Appends one cell per given game to the free cells. """
+        self.free[indices, self.n_free[indices]] = cells
+        self.free_pos[indices, cells] = self.n_free[indices]
+        self.n_free[indices] += 1
+
+    def init(self, indices=None):
+        """ Starts a new episode for the given environments (all by default). """
+        indices = self._envs if indices is None else np.asarray(indices)
+        if len(indices) == 0:
+            return
+
+        self.episode[indices] += 1
+        self.score[indices] = 0
+        self.direction[indices] = 3
+        self.current_step[indices] = 0
+
+        hx, hy = self.blocks_x // 2, self.blocks_y // 2
+        self.head_x[indices] = hx
+        self.head_y[indices] = hy
+
+        self.interior[indices] = Tile.empty
+        self.state_hash[indices] = 0
+        if self.obs_mode == "flat":
+            self.obs[indices, :self.cells] = Tile.empty
+        elif self.obs_mode == "grid":
+            self.obs[indices] = 0
+        body_x = np.arange(hx - self.init_length, hx)
+        for x in body_x:
+            self._paint(indices, x, hy, Tile.body)
+        self._paint(indices, hx, hy, Tile.head)
+
+        self.free[indices] = self.free_pos[indices] = np.arange(self.cells)
+        self.n_free[indices] = self.cells
+        for x in np.append(body_x, hx):
+            self._occupy(indices, x * self.blocks_y + hy)
+
+        # Tail to head in the ring buffer
+        self.ring[indices, :self.init_length + 1] = np.append(body_x, hx) * self.blocks_y + hy
+        self.head_ptr[indices] = self.init_length
+        self.length[indices] = self.init_length + 1
+
+        self._new_food(indices)
+        self.reward.reset(indices)
+
+        if self.cycle_detection is not None:
+            self._forget(indices)
+            self._visit(indices)
+
+    def _new_food(self, indices):
+        """ Places food on a uniformly chosen free cell, returns False where the board is full. """
+        placed = self.n_free[indices] > 0
+        indices = indices[placed]
+        cell = self.free[indices, (self.rng.random(indices) * self.n_free[indices]).astype(np.int64)]
+
+        self.food_x[indices] = cell // self.blocks_y
+        self.food_y[indices] = cell % self.blocks_y
+        self._paint(indices, self.food_x[indices], self.food_y[indices], Tile.food)
+
+        return placed
+
+    def _forget(self, indices):
+        """ Clears the boards seen by the given games. """
+        self.visited[indices] = 0
+        self.n_visited[indices] = 0
+
+    def _visit(self, indices):
+        """ Remembers the current board of the given games, returns where it was already seen. """
+        full = indices[self.n_visited[indices] >= MAX_VISITED_STATES]
+        if len(full):
+            self._forget(full)
+
+        # Linear probing from a slot picked by the high bits, 0 is kept for empty slots
+        keys = self.state_hash[indices] | np.uint64(1)
+        mask = np.uint64(self.visited.shape[1] - 1)
+        slots = ((keys >> np.uint64(40)) & mask).astype(np.int64)
+        repeated = np.zeros(len(indices), dtype=bool)
+        pending = np.arange(len(indices))
+        while len(pending):
+            rows, probe = indices[pending], slots[pending]
+            stored = self.visited[rows, probe]
+            repeated[pending] = stored == keys[pending]
+
+            empty = stored == 0
+            self.visited[rows[empty], probe[empty]] = keys[pending[empty]]
+            self.n_visited[rows[empty]] += 1
+
+            pending = pending[~empty & ~repeated[pending]]
+            slots[pending] = (slots[pending] + 1) & (self.visited.shape[1] - 1)
+
+        return repeated
+
+    def _paint(self, indices, x, y, code):
+        """ Writes cells of the board and of the board held in the observations. """
+        if self.cycle_detection is not None:
+            cell = x * self.blocks_y + y
+            self.state_hash[indices] ^= self.zobrist[self.interior[indices, x, y], cell] ^ self.zobrist[code, cell]
+        self.interior[indices, x, y] = code
+        self._paint_observation(indices, x, y, code)
+
+    def _paint_observation(self, indices, x, y, code):
+        """ Writes cells of the board held in the observations only. """
+        if self.obs_mode == "flat":
+            self.obs[indices, x * self.blocks_y + y] = code
+        elif self.obs_mode == "grid":
+            self.obs[indices, :, x, y] = 0
+            if code != Tile.empty:
+                self.obs[indices, GRID_CHANNELS[code], x, y] = 255
+
+    def get_surrounding_tiles(self, window_size=5):
+        """ Window of `window_size` tiles around each head, coded like `Snake.get_surrounding_tiles`. """
+        offsets = np.arange(window_size) - window_size // 2
+        xs = self.head_x[:, None] + self.pad + offsets
+        ys = self.head_y[:, None] + self.pad + offsets
+        tiles = self.board[self._envs[:, None, None], xs[:, :, None], ys[:, None, :]]
+
+        # The head is not part of the body in the tile encoding
+        return np.where(tiles == Tile.head, Tile.empty, tiles)
+
+    def step(self, actions):
+        """ Moves every snake one block.
+
+        Returns the observations, rewards, terminations and truncations of the
+        whole batch; finished environments are not reset here, see `init`.
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+        envs = self._envs
+        body_length = self.length - 1
+
+        self.current_step += 1
+        truncated = self.current_step == self.max_step
+
+        # Turning back on itself (or along the same axis) keeps the current direction
+        self.direction = np.where(actions // 2 == self.direction // 2, self.direction, actions)
+
+        old_x, old_y = self.head_x, self.head_y
+        self.head_x = old_x + STEP_X[self.direction]
+        self.head_y = old_y + STEP_Y[self.direction]
+
+        out_of_bounds = (self.head_x < 0) | (self.head_x >= self.blocks_x) \
+            | (self.head_y < 0) | (self.head_y >= self.blocks_y)
+        target = self.board[envs, self.head_x + self.pad, self.head_y + self.pad]
+        ate_food = target == Tile.food
+
+        # The tail leaves its cell before the head arrives, unless the snake grows
+        moving = envs[~ate_food]
+        tail = self.ring[moving, (self.head_ptr[moving] - self.length[moving] + 1) % self.cells]
+        self._paint(moving, tail // self.blocks_y, tail % self.blocks_y, Tile.empty)
+        self._release(moving, tail)
+        self.length[moving] -= 1
+
+        # Every snake moved, dead or not the neck is now body
+        self._paint(envs, old_x, old_y, Tile.body)
+
+        target = self.board[envs, self.head_x + self.pad, self.head_y + self.pad]
+        self_collision = ~out_of_bounds & (target == Tile.body)
+        dead = out_of_bounds | self_collision
+
+        # Only shown in the observation, the board keeps the body cell
+        collided = envs[self_collision]
+        self._paint_observation(collided, self.head_x[collided], self.head_y[collided], Tile.head)
+
+        alive = envs[~dead]
+        self._paint(alive, self.head_x[alive], self.head_y[alive], Tile.head)
+        self.head_ptr[alive] = (self.head_ptr[alive] + 1) % self.cells
+        self.ring[alive, self.head_ptr[alive]] = self.head_x[alive] * self.blocks_y + self.head_y[alive]
+        self._occupy(alive, self.ring[alive, self.head_ptr[alive]])
+        self.length[alive] += 1
+
+        won = np.zeros(self.num_envs, dtype=bool)
+        eaten = envs[ate_food]
+        if len(eaten):
+            self.score[eaten] += 1
+            won[eaten] = ~self._new_food(eaten)
+
+        cycle = np.zeros(self.num_envs, dtype=bool)
+        if self.cycle_detection is not None:
+            self._forget(eaten)
+            cycle[alive] = self._visit(alive)
+
+        reward = self.reward.calculate_reward(self.head_x, self.head_y, self.food_x, self.food_y, body_length,
+                                              ate_food, self.get_surrounding_tiles(), dead, self_collision)
+
+        terminated = dead | won
+        if self.cycle_detection == "terminate":
+            terminated |= cycle
+        elif self.cycle_detection == "truncate":
+            truncated |= cycle
+        return self.observation(), reward.astype(np.float32), terminated, truncated
+
+    def observation(self):
+        """ Observations of every game in the configured mode, see `Snake.observation`.
+
+        The board of the "flat" and "grid" modes is kept up to date by
+        `_paint`, only the remaining features are written here. The buffer is
+        reused by the next step.
+        """
+        obs = self.obs
+        if self.obs_mode == "grid":
+            return obs
+
+        if self.obs_mode == "window":
+            size = self.window_size * self.window_size
+            obs[:, :size] = self.get_surrounding_tiles(self.window_size).reshape(self.num_envs, size)
+            obs[:, size:size + 4] = 0
+            obs[self._envs, size + self.direction] = 1
+            obs[:, -2] = (self.food_x - self.head_x) / self.blocks_x
+            obs[:, -1] = (self.food_y - self.head_y) / self.blocks_y
+            return obs
+
+        obs[:, self.cells:self.cells + 4] = 0
+        obs[self._envs, self.cells + self.direction] = 1
+
+        max_distance = self.blocks_x + self.blocks_y
+        obs[:, -3] = (np.abs(self.head_x - self.food_x) + np.abs(self.head_y - self.food_y)) / max_distance
+        obs[:, -2] = STEP_X[self.direction]
+        obs[:, -1] = STEP_Y[self.direction]
+
+        return obs
+
+    def rgb_array(self):
+        """ RGB frames of every board, in a buffer reused by the next call. """
+        return self.renderer.render(self.interior)
+
+    def infos(self):
+        """ Step info of every game, including the components of the last reward. """
+        columns = {
+            'head': zip(self.head_x.tolist(), self.head_y.tolist()),
+            'food': zip(self.food_x.tolist(), self.food_y.tolist()),
+            **{name: value.tolist() for name, value in self.reward.components.items()}
+        }
+
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
@@ -0,0 +1,94 @@
+""" Helpers shared by the gyms. """
+
+import numpy as np
+
+_WORD = (1 << 64) - 1
+
+
+def get_rng_state(rng: np.random.Generator) -> np.ndarray:
+    """ Returns the state of a PCG64 generator as 6 uint64 words. """
+    state = rng.bit_generator.state
+    if state["bit_generator"] != "PCG64":
+        raise ValueError(f"Only PCG64 generators are supported, got {state['bit_generator']}")
+
+    words = state["state"]
+    return np.array([words["state"] >> 64, words["state"] & _WORD,
+                     words["inc"] >> 64, words["inc"] & _WORD,
+                     state["has_uint32"], state["uinteger"]], dtype=np.uint64)
+
+
+def set_rng_state(rng: np.random.Generator, words: np.ndarray) -> None:
+    """ Restores the state of a PCG64 generator from the words of `get_rng_state`. """
+    state_hi, state_lo, inc_hi, inc_lo, has_uint32, uinteger = (int(word) for word in words)
+    rng.bit_generator.state = {
+        "bit_generator": "PCG64",
+        "state": {"state": state_hi << 64 | state_lo, "inc": inc_hi << 64 | inc_lo},
+        "has_uint32": has_uint32,
+        "uinteger": uinteger,
+    }
+
+
+def _splitmix64(x):
+    """ SplitMix64 finalizer, turns consecutive counters into well mixed 64 bit words. """
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class BatchRandom:
+    """ One random stream per game of a batch, drawn for any subset of the games at once.
+
+    Each stream is a counter hashed with a per-game key, so the numbers a
+    game gets do not depend on how often the other games draw.
+    """
+
+    def __init__(self, num_envs, seed=None) -> None:
+        self.num_envs = num_envs
+        self.key = np.zeros(num_envs, dtype=np.uint64)
+        self.counter = np.zeros(num_envs, dtype=np.uint64)
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """ Seeds game `i` with `seed + i`, or with `seed[i]` when given one seed per game. """
+        if seed is None or np.isscalar(seed):
+            seed = [None if seed is None else seed + i for i in range(self.num_envs)]
+
+        self.key[:] = [np.random.SeedSequence(s).generate_state(1, np.uint64)[0] for s in seed]
+        self.counter[:] = 0
+
+    def random(self, indices):
+        """ Next uniform number in [0, 1) of each given game's stream. """
+        self.counter[indices] += np.uint64(1)
+        x = _splitmix64(self.key[indices] + self.counter[indices] * np.uint64(0x9E3779B97F4A7C15))
+        return (x >> np.uint64(11)) * 2.0 ** -53
+
+
+def repeat_action(step, action, repeat, max_pool=False, prefix="reward/"):
+    """ Plays `action` for `repeat` frames through `step`, the single frame step of a gym.
+
+    The rewards are summed, and so are the reward components found in the
+    infos under `prefix`, and the repeat stops on the frame ending the
+    episode. With `max_pool`, the observation is the element-wise maximum of
+    the last two frames played, so what only shows on one of them is kept.
+    """
+    total_reward = 0.0
+    components = {}
+    previous = None
+    for frame in range(repeat):
+        obs, reward, terminated, truncated, info = step(action)
+        total_reward += reward
+        for key, value in info.items():
+            if key.startswith(prefix):
+                components[key] = components.get(key, 0) + value
+
+        if terminated or truncated or frame == repeat - 1:
+            break
+        if max_pool:
+            # Observations may be buffers reused by the next frame
+            previous = np.array(obs, copy=True)
+
+    if previous is not None:
+        obs = np.maximum(previous, obs, out=previous)
+    info.update(components)
+
+    return obs, total_reward, terminated, truncated, info
@@ -0,0 +1,56 @@
+import numpy as np
+import pygame
+
+from gyms.FlappyBird.game_logic import PIPE_HEIGHT, PLAYER_MIN_ROT, PLAYER_ROT_THR
+from gyms.FlappyBird.hitmasks import load_hitmasks
+from gyms.FlappyBird.utils import load_images
+
+PLAYER_X = 57
+
+
+def pygame_collisions(placements):
+    """ Collisions of the bird and the pipes at each placement, as tested by `pygame.mask` on the drawn sprites. """
+    images = load_images(convert=False)
+    upper_mask, lower_mask = (pygame.mask.from_surface(pipe) for pipe in images["pipe"])
+    player_masks = {}
+
+    hits = []
+    for player_y, idx, rot, pipe_x, upper_y, lower_y in placements:
+        visible_rot = min(rot, PLAYER_ROT_THR)
+        if (idx, visible_rot) not in player_masks:
+            player_masks[idx, visible_rot] = pygame.mask.from_surface(
+                pygame.transform.rotate(images["player"][idx], visible_rot))
+        mask = player_masks[idx, visible_rot]
+
+        x, y = PLAYER_X, int(player_y)
+        hits.append(any(mask.overlap(pipe_mask, (int(pipe_x) - x, int(pipe_y) - y)) is not None
+                        for pipe_mask, pipe_y in ((upper_mask, upper_y), (lower_mask, lower_y))))
+    return np.array(hits)
+
+
+def test_hitmasks_match_pygame_masks():
+    # Placements skimming the pipes, where rectangles and pixels disagree the most
+    rng = np.random.default_rng(0)
+    count = 5000
+    player_y = rng.uniform(100, 300, count)
+    lower_y = (player_y + rng.integers(-40, 40, count)).astype(np.int64)
+    placements = list(zip(
+        player_y.tolist(),
+        rng.integers(0, 3, count).tolist(),
+        rng.integers(PLAYER_MIN_ROT, 46, count).tolist(),
+        rng.uniform(PLAYER_X - 60, PLAYER_X + 40, count).tolist(),
+        (lower_y - 100 - PIPE_HEIGHT).tolist(),
+        lower_y.tolist(),
+    ))
+    expected = pygame_collisions(placements)
+    # Both outcomes are well covered
+    assert 500 < expected.sum() < count - 500
+
+    hitmasks = load_hitmasks()
+    single = [hitmasks.collides(PLAYER_X, player_y, idx, rot, pipe_x, upper_y, lower_y)
+              for player_y, idx, rot, pipe_x, upper_y, lower_y in placements]
+    np.testing.assert_array_equal(single, expected)
+
+    player_y, idx, rot, pipe_x, upper_y, lower_y = map(np.array, zip(*placements))
+    batch = hitmasks.collides_batch(PLAYER_X, player_y, idx, rot, pipe_x, upper_y, lower_y)
+    np.testing.assert_array_equal(batch, expected)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from gyms.FlappyBird.game_logic import FlappyBirdLogic
+from gyms.Snake.game_logic import Snake
+from gyms.Snake.utils import OBS_MODES
+
+SNAKE_CONFIG = dict(width=8, height=8, max_step=150, death_penalty=-10, living_bonus=-0.1, food_reward=25,
+                    dist_reward=10, cycle_detection="truncate")
+
+
+def play_snake(game, actions):
+    """ Steps of `game` playing `actions`, starting a new episode after each one ends. """
+    steps = []
+    for action in actions:
+        obs, reward, terminated, truncated = game.step(action)
+        steps.append((obs.copy(), reward, terminated, truncated, game.info()))
+        if terminated or truncated:
+            game.init()
+    return steps
+
+
+def assert_same_steps(steps, expected):
+    assert len(steps) == len(expected)
+    for (obs, *rest), (expected_obs, *expected_rest) in zip(steps, expected):
+        np.testing.assert_array_equal(obs, expected_obs)
+        assert rest == expected_rest
+
+
+@pytest.mark.parametrize("obs_mode", OBS_MODES)
+def test_snake_snapshot_replays(obs_mode):
+    config = dict(SNAKE_CONFIG, obs_mode=obs_mode)
+    rng = np.random.default_rng(0)
+    game = Snake(**config)
+    game.seed(0)
+    game.init()
+    play_snake(game, rng.integers(0, 4, 40).tolist())
+
+    state, observation = game.get_state(), game.observation().copy()
+    actions = rng.integers(0, 4, 2000).tolist()
+    expected = play_snake(game, actions)
+    assert sum(terminated or truncated for _, _, terminated, truncated, _ in expected) > 10
+    end_state = game.get_state()
+
+    # Restored into the same game and into another one with a different food RNG
+    other = Snake(**config)
+    other.seed(1)
+    other.init()
+    for restored in (game, other):
+        restored.set_state(state)
+        assert restored.get_state() == state
+        np.testing.assert_array_equal(restored.observation(), observation)
+        assert_same_steps(play_snake(restored, actions), expected)
+        assert restored.get_state() == end_state
+
+
+def play_flappy_bird(game, steps):
+    """ Trajectory of `game` flapping whenever the player falls below the middle of the next gap, until it dies. """
+    trajectory = []
+    for _ in range(steps):
+        _, _, lower_pipe_y = game.next_pipe()
+        action = int(game.player_y > lower_pipe_y - 50)
+        alive = game.update_state(action)
+        trajectory.append((alive, game.player_y, game.player_vel_y, game.score, list(game.pipes()),
+                           game.next_pipe()))
+        if not alive:
+            break
+    return trajectory
+
+
+def test_flappy_bird_snapshot_replays():
+    game = FlappyBirdLogic(screen_size=(288, 512), np_random=np.random.default_rng(2))
+    play_flappy_bird(game, 100)
+
+    state = game.get_state()
+    expected = play_flappy_bird(game, 1000)
+    # Long enough for the pipes to be drawn from the restored RNG
+    assert len(expected) == 1000 and game.score > 20
+    end_state = game.get_state()
+
+    other = FlappyBirdLogic(screen_size=(288, 512), np_random=np.random.default_rng(1))
+    for restored in (game, other):
+        restored.set_state(state)
+        assert restored.get_state() == state
+        assert play_flappy_bird(restored, 1000) == expected
+        assert restored.get_state() == end_state
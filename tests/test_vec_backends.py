@@ -0,0 +1,50 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from gyms.FlappyBird.FlappyBirdSimpleGym import FlappyBirdSimpleGym
+from gyms.Snake.SnakeGym import SnakeGym
+from training.core.vec_backends import make_vec_env
+
+BACKENDS = [("subproc", None), ("subproc-batched", 2), ("shared-memory", 2)]
+GYMS = {
+    "snake": partial(SnakeGym, width=8, height=8, max_step=60, obs_mode="window"),
+    "flappy_bird": FlappyBirdSimpleGym,
+}
+
+
+def play(env_fn, backend, envs_per_worker, num_envs=4, steps=200):
+    """ First observation and the observations, rewards, dones and infos of `steps` seeded random steps. """
+    env = make_vec_env([env_fn] * num_envs, backend, envs_per_worker)
+    try:
+        env.seed(0)
+        first_obs = env.reset()
+        rng = np.random.default_rng(0)
+        return first_obs, [env.step(rng.integers(0, env.action_space.n, num_envs)) for _ in range(steps)]
+    finally:
+        env.close()
+
+
+@pytest.mark.parametrize("backend, envs_per_worker", BACKENDS)
+@pytest.mark.parametrize("gym", GYMS)
+def test_backends_match_dummy(gym, backend, envs_per_worker):
+    expected_first_obs, expected = play(GYMS[gym], "dummy", None)
+    first_obs, steps = play(GYMS[gym], backend, envs_per_worker)
+
+    # Episodes end along the way, so the automatic resets are compared too
+    assert sum(dones.sum() for _, _, dones, _ in expected) >= 4
+    np.testing.assert_array_equal(first_obs, expected_first_obs)
+    for (obs, rewards, dones, infos), (expected_obs, expected_rewards, expected_dones, expected_infos) in zip(
+            steps, expected):
+        np.testing.assert_array_equal(obs, expected_obs)
+        # DummyVecEnv rounds rewards to float32, the process backends keep float64 like SubprocVecEnv
+        assert rewards.dtype == np.float64
+        np.testing.assert_array_equal(rewards.astype(expected_rewards.dtype), expected_rewards)
+        np.testing.assert_array_equal(dones, expected_dones)
+        for info, expected_info in zip(infos, expected_infos):
+            assert info.keys() == expected_info.keys()
+            if "terminal_observation" in expected_info:
+                np.testing.assert_array_equal(info.pop("terminal_observation"),
+                                              expected_info.pop("terminal_observation"))
+            assert info == expected_info
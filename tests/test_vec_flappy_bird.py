@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from gyms.FlappyBird.FlappyBirdSimpleGym import FlappyBirdSimpleGym
+from gyms.FlappyBird.game_logic import PLAYER_HEIGHT
+from gyms.FlappyBird.vec_game_logic import VecFlappyBird
+
+
+def follow_pipes(vec, envs):
+    """ Makes `vec` spawn the pipes the paired gyms spawned at the same x, the engines draw gaps differently. """
+    def spawn_pipe(indices, x):
+        for i, slot in zip(indices.tolist(), vec.n_pipes[indices].tolist()):
+            _, upper_y, lower_y = next(pipe for pipe in envs[i]._game.pipes() if pipe[0] == x)
+            vec.pipe_x[i, slot], vec.upper_y[i, slot], vec.lower_y[i, slot] = x, upper_y, lower_y
+        vec.n_pipes[indices] += 1
+
+    vec._spawn_pipe = spawn_pipe
+
+
+@pytest.mark.parametrize("pixel_collision", [False, True])
+def test_vec_flappy_bird_matches_gym(pixel_collision):
+    num_envs = 6
+    envs = [FlappyBirdSimpleGym(pixel_collision=pixel_collision) for _ in range(num_envs)]
+    vec = VecFlappyBird(num_envs, pixel_collision=pixel_collision)
+    follow_pipes(vec, envs)
+    observations = [env.reset(seed=i)[0] for i, env in enumerate(envs)]
+    vec.init()
+    np.testing.assert_array_equal(vec.observation(), observations)
+
+    rng = np.random.default_rng(0)
+    episodes = best_score = 0
+    for _ in range(3000):
+        # Flap once the top of the player falls below the middle of the gap, with a few random moves
+        actions = (vec.observation()[:, 1] * 512 < -PLAYER_HEIGHT / 2).astype(np.int64)
+        actions = np.where(rng.random(num_envs) < 0.01, 1 - actions, actions)
+        expected = [env.step(int(action)) for env, action in zip(envs, actions)]
+        obs, rewards, crashed = vec.step(actions)
+
+        done = []
+        for i, (env_obs, reward, terminated, truncated, info) in enumerate(expected):
+            game = envs[i]._game
+            np.testing.assert_array_equal(obs[i], env_obs)
+            assert rewards[i] == pytest.approx(reward)
+            assert crashed[i] == terminated and not truncated
+            assert vec.infos()[i] == info
+            assert (vec.player_y[i], vec.player_vel_y[i], vec.player_rot[i], vec.player_idx[i], vec.base_x[i]) == (
+                game.player_y, game.player_vel_y, game.player_rot, game.player_idx, game.base_x)
+            n = vec.n_pipes[i]
+            assert list(zip(vec.pipe_x[i, :n], vec.upper_y[i, :n], vec.lower_y[i, :n])) == list(game.pipes())
+            if terminated:
+                done.append(i)
+
+        episodes += len(done)
+        best_score = max(best_score, vec.score.max())
+        for i in done:
+            envs[i].reset()
+        vec.init(np.array(done, dtype=np.int64))
+
+    assert episodes > 20
+    assert best_score > 10
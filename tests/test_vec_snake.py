@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from gyms.Snake.game_logic import Snake
+from gyms.Snake.utils import Tile
+from gyms.Snake.vec_game_logic import VecSnake
+
+CONFIG = dict(width=8, height=8, max_step=150, death_penalty=-10, living_bonus=-0.1, food_reward=25, dist_reward=10)
+
+
+def follow_food(vec, games):
+    """ Makes `vec` place its food where the paired `Snake` games placed theirs, the engines draw differently. """
+    def new_food(indices):
+        placed = vec.n_free[indices] > 0
+        indices = indices[placed]
+        vec.food_x[indices] = [games[i].food.block.x for i in indices]
+        vec.food_y[indices] = [games[i].food.block.y for i in indices]
+        vec._paint(indices, vec.food_x[indices], vec.food_y[indices], Tile.food)
+        return placed
+
+    vec._new_food = new_food
+
+
+@pytest.mark.parametrize("obs_mode", ["flat", "window", "grid"])
+@pytest.mark.parametrize("cycle_detection", [None, "truncate"])
+def test_vec_snake_matches_snake(obs_mode, cycle_detection):
+    num_envs = 6
+    config = dict(CONFIG, obs_mode=obs_mode, cycle_detection=cycle_detection)
+    games = [Snake(**config) for _ in range(num_envs)]
+    vec = VecSnake(num_envs, **config)
+    follow_food(vec, games)
+    for i, game in enumerate(games):
+        game.seed(i)
+        game.init()
+    vec.init()
+
+    rng = np.random.default_rng(0)
+    episodes = 0
+    for _ in range(1000):
+        actions = rng.integers(0, 4, num_envs)
+        expected = [game.step(int(action)) for game, action in zip(games, actions)]
+        obs, rewards, terminated, truncated = vec.step(actions)
+
+        done = []
+        for i, (game_obs, reward, game_terminated, game_truncated) in enumerate(expected):
+            # Terminal steps included, their observation is SB3's terminal_observation
+            np.testing.assert_array_equal(obs[i], game_obs)
+            assert rewards[i] == pytest.approx(reward)
+            assert (terminated[i], truncated[i]) == (game_terminated, game_truncated)
+            assert vec.infos()[i] == pytest.approx(games[i].info())
+            if game_terminated or game_truncated:
+                done.append(i)
+
+        episodes += len(done)
+        for i in done:
+            games[i].init()
+        vec.init(np.array(done, dtype=np.int64))
+
+    assert episodes > 50
@@ -1,4 +1,4 @@
-import importlib
+import json
 
 import typer
 
@@ -15,8 +15,13 @@ def _version_callback(value: bool) -> None:
 
 
 def get_module(trainer, config):
-    module = importlib.import_module("training.trainers")
-    mclass = getattr(module, trainer)
+    # Only the chosen trainer, and through it torch and stable_baselines3, is imported
+    from training.trainers import get_trainer
+
+    try:
+        mclass = get_trainer(trainer)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="'--trainer' / '-t'")
     return mclass(config)
 
 
@@ -46,6 +51,15 @@ def cast_type(key: str, value: str):
             return value
 
 
+def parse_extra_args(ctx: typer.Context, config: dict) -> dict:
+    """ Adds the `--key value` pairs left on the command line to `config`. """
+    for key, value in zip(ctx.args[::2], ctx.args[1::2]):
+        # --vec-backend and --vec_backend set the same option
+        key = key.lstrip("-").replace("-", "_")
+        config[key] = cast_type(key, value)
+    return config
+
+
 @app.callback()
 def main(
         version: Optional[bool] = typer.Option(
@@ -60,6 +74,15 @@ def main(
     return
 
 
+@app.command("list")
+def list_trainers() -> None:
+    """List the available trainers."""
+    from training.trainers import TRAINERS
+
+    for name in TRAINERS:
+        typer.echo(name)
+
+
 @app.command(
     context_settings={"allow_extra_args": True, "ignore_unknown_options": True}
 )
@@ -90,22 +113,21 @@ def train(
             help="Number of timesteps to train with"
         )
 ) -> None:
-    config = {
+    config = parse_extra_args(ctx, {
         "wandb": wandb,
         "timesteps": timesteps,
         "run_id": run_id
-    }
-
-    for key, value in zip(ctx.args[::2], ctx.args[1::2]):
-        key = key.strip("--")
-        config[key] = cast_type(key, value)
+    })
 
     instance = get_module(trainer, config)
     instance.train()
 
 
-@app.command()
+@app.command(
+    context_settings={"allow_extra_args": True, "ignore_unknown_options": True}
+)
 def watch(
+        ctx: typer.Context,
         trainer: str = typer.Option(
             None,
             "--trainer",
@@ -117,12 +139,98 @@ def watch(
             "--run-id",
             "-r",
             help="Run ID to watch"
+        ),
+        reload_interval: float = typer.Option(
+            5.0,
+            "--reload-interval",
+            "-i",
+            help="Seconds between checks for a newer checkpoint while watching"
         )
 ) -> None:
-    instance = get_module(trainer, {})
+    instance = get_module(trainer, parse_extra_args(ctx, {"reload_interval": reload_interval}))
     instance.watch(run_id)
 
 
+@app.command(
+    context_settings={"allow_extra_args": True, "ignore_unknown_options": True}
+)
+def evaluate(
+        ctx: typer.Context,
+        trainer: str = typer.Option(
+            None,
+            "--trainer",
+            "-t",
+            help="Trainer to use"
+        ),
+        run_id: str = typer.Option(
+            None,
+            "--run-id",
+            "-r",
+            help="Run ID to evaluate"
+        ),
+        step: Optional[int] = typer.Option(
+            None,
+            "--step",
+            "-s",
+            help="Timesteps of the checkpoint to evaluate, the latest by default"
+        ),
+        episodes: int = typer.Option(
+            100,
+            "--episodes",
+            "-n",
+            min=1,
+            help="Number of episodes, seeded from --seed on"
+        ),
+        workers: Optional[int] = typer.Option(
+            None,
+            "--workers",
+            "-j",
+            help="Worker processes, one per core by default"
+        ),
+        envs_per_worker: int = typer.Option(
+            8,
+            "--envs-per-worker",
+            help="Games each worker plays at once, with one batched prediction per step"
+        ),
+        seed: int = typer.Option(
+            0,
+            "--seed",
+            help="Seed of the first episode"
+        ),
+        stochastic: bool = typer.Option(
+            False,
+            "--stochastic",
+            help="Sample actions instead of taking the most likely one"
+        ),
+        max_steps: Optional[int] = typer.Option(
+            10000,
+            "--max-steps",
+            help="Cut episodes still running after this many steps"
+        ),
+        output: Optional[str] = typer.Option(
+            None,
+            "--output",
+            "-o",
+            help="Also write the report to this JSON file"
+        )
+) -> None:
+    from training.core.CheckpointManifest import CheckpointNotFoundError
+    from training.core.evaluation import format_report
+
+    instance = get_module(trainer, parse_extra_args(ctx, {}))
+    try:
+        report = instance.evaluate(run_id, step, episodes, workers, envs_per_worker, seed, not stochastic, max_steps)
+    except CheckpointNotFoundError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+    for line in format_report(report):
+        typer.echo(line)
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
 @app.command()
 def play(
         trainer: str = typer.Option(
@@ -0,0 +1,146 @@
+import copy
+import os
+import queue
+import threading
+import traceback
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.save_util import recursive_getattr, save_to_zip_file
+from stable_baselines3.common.utils import safe_mean
+
+from training.core.CheckpointManifest import CheckpointManifest
+from training.core.evaluation import run_episodes
+from training.core.flat_weights import save_flat_weights, weights_path
+
+
+def episode_metrics(model):
+    """ Mean reward and length of the recent episodes of `model`, for the manifest. """
+    if not model.ep_info_buffer:
+        return {}
+    return {
+        "ep_rew_mean": float(safe_mean([info["r"] for info in model.ep_info_buffer])),
+        "ep_len_mean": float(safe_mean([info["l"] for info in model.ep_info_buffer])),
+    }
+
+
+def evaluation_metrics(policy, make_env, episodes, max_steps=None):
+    """ Mean return, length and game score of `policy` over `episodes` deterministic episodes, for the manifest.
+
+    The episodes are seeded 0 on, so every checkpoint is scored on the same
+    games.
+    """
+    returns, lengths, scores, _ = zip(*run_episodes(policy, make_env, range(episodes), num_envs=episodes,
+                                                    max_steps=max_steps))
+    metrics = {"eval_return_mean": float(np.mean(returns)), "eval_len_mean": float(np.mean(lengths))}
+    if not np.isnan(scores).any():
+        metrics["eval_score_mean"] = float(np.mean(scores))
+    return metrics
+
+
+def snapshot_model(model):
+    """ Copies of everything `model.save` writes, so training can go on while they are written.
+
+    Returns the `data`, `params` and `pytorch_variables` of `save_to_zip_file`.
+    """
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    exclude = set(model._excluded_save_params())
+    exclude.update(name.split(".")[0] for name in state_dicts_names + torch_variable_names)
+    data = {key: value for key, value in model.__dict__.items() if key not in exclude}
+
+    pytorch_variables = None
+    if torch_variable_names:
+        pytorch_variables = {name: recursive_getattr(model, name) for name in torch_variable_names}
+
+    return copy.deepcopy(data), copy.deepcopy(model.get_parameters()), copy.deepcopy(pytorch_variables)
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """ Saves a checkpoint every `save_freq` calls like `CheckpointCallback`,
+    without stopping training to write it.
+
+    The model is copied in memory and a background thread writes the copy to
+    a temporary file, renames it into place, exports the policy weights
+    next to it for fast loading (see `flat_weights`), lists both in the run's
+    `CheckpointManifest` and deletes the checkpoints the retention rules of
+    `CheckpointManifest.prune` no longer keep. At most `max_pending`
+    checkpoints wait to be written, training blocks beyond that.
+
+    With `eval_env_fn`, the writer also plays `eval_episodes` seeded,
+    deterministic episodes of every checkpoint on environments it makes (see
+    `evaluation_metrics`) and `keep_best` ranks the checkpoints by their mean
+    return. Without it, they are ranked by the mean reward of the recent
+    training episodes, which were played with sampled actions.
+    """
+
+    def __init__(self, save_freq, save_path, name_prefix="rl_model", keep_last=None, keep_every=None,
+                 keep_best=0, metric=None, eval_env_fn=None, eval_episodes=10, eval_max_steps=10000,
+                 max_pending=2, verbose=0):
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.save_path = save_path
+        self.name_prefix = name_prefix
+        if metric is None:
+            metric = "ep_rew_mean" if eval_env_fn is None else "eval_return_mean"
+        self.retention = {"keep_last": keep_last, "keep_every": keep_every, "keep_best": keep_best, "metric": metric}
+        self.eval_env_fn = eval_env_fn
+        self.eval_episodes = eval_episodes
+        self.eval_max_steps = eval_max_steps
+        self.manifest = CheckpointManifest(save_path)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._writer = None
+        self._eval_policy = None
+
+    def _init_callback(self) -> None:
+        os.makedirs(self.save_path, exist_ok=True)
+
+    def _on_training_start(self) -> None:
+        if self.eval_env_fn is not None:
+            # Loaded with the weights of each checkpoint by the writer, on the CPU to leave the learner its device
+            policy = self.model.policy
+            self._eval_policy = type(policy)(**policy._get_constructor_parameters())
+            self._eval_policy.set_training_mode(False)
+        self._writer = threading.Thread(target=self._write_checkpoints, name="AsyncCheckpointWriter", daemon=True)
+        self._writer.start()
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.save_freq == 0:
+            path = os.path.join(self.save_path, f"{self.name_prefix}_{self.num_timesteps}_steps.zip")
+            self._queue.put((path, self.num_timesteps, snapshot_model(self.model), episode_metrics(self.model)))
+        return True
+
+    def _on_training_end(self) -> None:
+        self.flush()
+
+    def flush(self) -> None:
+        """ Waits until every pending checkpoint is written. """
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _write_checkpoints(self) -> None:
+        while (job := self._queue.get()) is not None:
+            path, step, (data, params, pytorch_variables), metrics = job
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    save_to_zip_file(f, data=data, params=params, pytorch_variables=pytorch_variables)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                save_flat_weights(params["policy"], weights_path(path), step=step)
+                if self._eval_policy is not None:
+                    self._eval_policy.load_state_dict(params["policy"])
+                    metrics = {**metrics, **evaluation_metrics(self._eval_policy, self.eval_env_fn,
+                                                               self.eval_episodes, self.eval_max_steps)}
+                self.manifest.add(path, step, metrics, weights=weights_path(path))
+                if self.verbose >= 2:
+                    print(f"Saved model checkpoint to {path}")
+
+                for entry in self.manifest.prune(**self.retention):
+                    if self.verbose >= 2:
+                        print(f"Deleted model checkpoint {entry['file']}")
+            except Exception:
+                # A failed checkpoint doesn't stop training
+                traceback.print_exc()
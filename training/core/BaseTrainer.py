@@ -1,15 +1,21 @@
+import copy
 import os
 from abc import abstractmethod, ABC
 
 import torch
 import typer
-import wandb
-from stable_baselines3.common.callbacks import CheckpointCallback
 from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.vec_env import SubprocVecEnv
-from wandb.integration.sb3 import WandbCallback
-
+from stable_baselines3.common.vec_env import VecMonitor
+
+from training.core.AsyncCheckpointCallback import AsyncCheckpointCallback, episode_metrics
+from training.core.CheckpointManifest import CheckpointManifest, CheckpointNotFoundError
+from training.core.PolicyReloader import PolicyReloader
+from training.core.RewardComponentsCallback import RewardComponentsCallback
+from training.core.cpu_profile import apply_cpu_profile, resolve_device
+from training.core.evaluation import evaluate_checkpoint
+from training.core.flat_weights import load_policy_weights, save_flat_weights, weights_path
 from training.core.Run import Run
+from training.core.vec_backends import available_cores, make_vec_env, select_vec_backend
 
 
 class BaseTrainer(ABC):
@@ -34,6 +40,11 @@ class BaseTrainer(ABC):
     def training_algorithm(self):
         pass
 
+    @property
+    def native_vec_env(self):
+        """VecEnv class stepping all environments in one call, used by the `native` backend."""
+        return None
+
     def __init__(self, config, gym):
         self.project_entity = "ml-playground"
         self.model_save_path = "./models"
@@ -41,7 +52,11 @@ class BaseTrainer(ABC):
         self.timesteps = config.get('timesteps')
         self.wandb = config.get('wandb')
         self.config.update(config)
+        # Given on the command line, these win over the parameters recorded with a run
+        self._given_config = dict(config)
+        self.device = resolve_device(self.config.get("device", "auto"))
         self.gym = gym
+        self._manifests = {}
 
     def _filter_config(self):
         return {k: v for k, v in self.config.items() if k in self.parameters}
@@ -51,7 +66,7 @@ class BaseTrainer(ABC):
         return self.training_algorithm(
             # batch_size= n_steps // 10,
             batch_size=self.config.get("n_steps") * self.config.get("num_envs"),
-            device="cuda",
+            device=self.device,
             ent_coef=self.config.get("ent_coef"),
             env=env,
             gae_lambda=self.config.get("gae_lambda"),
@@ -64,39 +79,102 @@ class BaseTrainer(ABC):
             vf_coef=self.config.get("vf_coef")
         )
 
-    def _get_model(self, run_id, env, current_model, current_iteration):
-        filenames = os.listdir(f"{self.model_save_path}/{self.project_name}/{run_id}")
+    def _run_dir(self, run_id):
+        return f"{self.model_save_path}/{self.project_name}/{run_id}"
+
+    def _get_manifest(self, run_id):
+        # Kept per run so watching only re-reads the manifest when it changed
+        if run_id not in self._manifests:
+            self._manifests[run_id] = CheckpointManifest(self._run_dir(run_id))
+        return self._manifests[run_id]
+
+    def _latest_checkpoint(self, run_id):
+        manifest = self._get_manifest(run_id)
+        # Runs saved before the manifest only have their checkpoint files
+        return manifest.latest() or manifest.legacy_latest()
+
+    def _load_checkpoint(self, run_id, checkpoint, env=None, current_model=None):
+        if current_model is not None and checkpoint.get("weights") is not None:
+            # Only the policy changes, drop its exported weights into a copy of the current one
+            print(f"Loading policy weights at episode {checkpoint['step']}")
+            policy = current_model.policy
+            model = copy.copy(current_model)
+            model.policy = type(policy)(**policy._get_constructor_parameters()).to(policy.device)
+            load_policy_weights(model.policy, f"{self._run_dir(run_id)}/{checkpoint['weights']}")
+            model.policy.set_training_mode(False)
+            return model
+
+        print(f"Loading training model at episode {checkpoint['step']}")
+        return self.training_algorithm.load(
+            f"{self._run_dir(run_id)}/{checkpoint['file']}",
+                env=env,
+                custom_objects={
+                    "batch_size": self.config.get("n_steps") * self.config.get("num_envs"),
+                    "device": self.device,
+                    "ent_coef":  self.config.get("ent_coef"),
+                    "gae_lambda": self.config.get("gae_lambda"),
+                    "gamma": self.config.get("gamma"),
+                    "learning_rate": self.config.get("learning_rate"),
+                        # n_steps=n_steps,
+                    "n_steps": self.config.get("n_steps"),
+                    "policy": self.config.get("policy"),
+                    "tensorboard_log": f"{self.tensorboard_logs}/{self.project_name}",
+                    "vf_coef": self.config.get("vf_coef")
+                }
+            )
+
+    def _load_policy(self, run_id, checkpoint, env):
+        """ Policy of `checkpoint` for playing `env`, built from its exported weights when it has some. """
+        if checkpoint.get("weights") is None:
+            return self._load_checkpoint(run_id, checkpoint).policy
 
-        max_value = max(int(filename.strip('training_timesteps__steps.zip')) for filename in filenames if
-                        filename.endswith(".zip") and filename.startswith("training"))
+        # Only the policy is needed, not the optimizer state and the rest of the checkpoint
+        print(f"Loading policy weights at episode {checkpoint['step']}")
+        policy_class = self.training_algorithm.policy_aliases[self.config.get("policy")]
+        policy = policy_class(env.observation_space, env.action_space, lr_schedule=lambda _: 0.0).to(self.device)
+        load_policy_weights(policy, f"{self._run_dir(run_id)}/{checkpoint['weights']}")
+        policy.set_training_mode(False)
+        return policy
 
-        if max_value is None or max_value == current_iteration:
+    def _get_model(self, run_id, env, current_model, current_iteration):
+        checkpoint = self._latest_checkpoint(run_id)
+        if checkpoint is None:
+            if current_model is None:
+                return self._create_model(env), None
+            return current_model, current_iteration
+
+        max_value = checkpoint["step"]
+        if max_value == current_iteration:
             return current_model, max_value
 
-        print(f"Loading training model at episode {max_value}")
-        try:
-            return (self.training_algorithm.load(
-                f"{self.model_save_path}/{self.project_name}/{run_id}/training_timesteps__{str(max_value)}_steps",
-                    env=env,
-                    custom_objects={
-                        "batch_size": self.config.get("n_steps") * self.config.get("num_envs"),
-                        "device": "cuda",
-                        "ent_coef":  self.config.get("ent_coef"),
-                        "gae_lambda": self.config.get("gae_lambda"),
-                        "gamma": self.config.get("gamma"),
-                        "learning_rate": self.config.get("learning_rate"),
-                            # n_steps=n_steps,
-                        "n_steps": self.config.get("n_steps"),
-                        "policy": self.config.get("policy"),
-                        "tensorboard_log": f"{self.tensorboard_logs}/{self.project_name}",
-                        "vf_coef": self.config.get("vf_coef")
-                    }
-                ), max_value)
-        except:
-            return self._create_model(env), None
-
-    def wandb_init(self) -> wandb.sdk.wandb_run.Run | Run:
+        return self._load_checkpoint(run_id, checkpoint, env), max_value
+
+    def _use_run_gym_config(self, run_id):
+        """ Creates the gym with the parameters `run_id` was trained with from now on. """
+        recorded = self._get_manifest(run_id).gym_config()
+        if recorded is None:
+            # Runs saved before the parameters were recorded keep the given ones
+            return
+        self.config.update(recorded)
+        self.config.update({k: v for k, v in self._given_config.items() if k in self.parameters})
+
+    def _create_watch_env(self, run_id):
+        """ Gym rendering to a window, created like the ones `run_id` was trained on. """
+        self._use_run_gym_config(run_id)
+        return self.gym(render_mode="human", **self._filter_config())
+
+    def _start_reloader(self, run_id, env):
+        """ Loads the latest model of `run_id` and starts reloading newer checkpoints in the background. """
+        model, iteration = self._get_model(run_id, env, None, None)
+        reloader = PolicyReloader(self, run_id, model, iteration, interval=self.config.get("reload_interval", 5.0))
+        reloader.start()
+        return reloader
+
+    def wandb_init(self) -> "wandb.sdk.wandb_run.Run | Run":
         if self.wandb:
+            # wandb takes seconds to import, only pay for it when it's used
+            import wandb
+
             wandb.login(key=os.environ["WANDB_API_KEY"])
             return wandb.init(
                 project=self.project_name,
@@ -115,19 +193,43 @@ class BaseTrainer(ABC):
         return _init
 
     def get_env(self):
-        envs = [self._create_env() for _ in range(self.config.get("num_envs"))]
-        env = SubprocVecEnv(envs)
+        if self.config.get("vec_backend", "subproc") == "native":
+            if self.native_vec_env is None:
+                raise ValueError(f"{type(self).__name__} has no native vectorized environment")
 
-        return env
+            # Actions are repeated by the gyms, one game at a time
+            kwargs = self._filter_config()
+            if kwargs.pop("action_repeat", 1) != 1:
+                raise ValueError("action_repeat is not supported by the native backend, use subproc")
+            kwargs.pop("max_pool_obs", None)
+
+            return VecMonitor(self.native_vec_env(self.config.get("num_envs"), **kwargs))
+
+        env_fns = [self._create_env() for _ in range(self.config.get("num_envs"))]
+        backend = self.config.get("vec_backend", "subproc")
+        envs_per_worker = self.config.get("envs_per_worker")
+        if backend == "auto":
+            typer.echo("Timing the vectorized environment backends")
+            backend, envs_per_worker = select_vec_backend(env_fns, echo=typer.echo)
+            typer.echo(f"Using the {backend} backend")
+
+        return make_vec_env(env_fns, backend, envs_per_worker)
 
     def train(self) -> None:
-        if torch.cuda.is_available():
-            print(torch.cuda.get_device_name())
+        if torch.device(self.device).type == "cuda":
+            print(torch.cuda.get_device_name(self.device))
         else:
             print("CPU Training")
 
         run = self.wandb_init()
         env = self.get_env()
+        apply_cpu_profile(
+            env,
+            self.device,
+            torch_threads=self.config.get("torch_threads"),
+            cpu_affinity=self.config.get("cpu_affinity", False),
+            echo=typer.echo
+        )
 
         if self.config.get("run_id") is not None:
             model, _ = self._get_model(self.config.get("run_id"), env, None, None)
@@ -135,18 +237,27 @@ class BaseTrainer(ABC):
             model = self._create_model(env)
 
         typer.echo(f"Starting run {run.id}")
+        os.makedirs(self._run_dir(run.id), exist_ok=True)
+        self._get_manifest(run.id).set_gym_config(self._filter_config())
 
         callbacks = []
-        checkpoint = CheckpointCallback(
+        checkpoint = AsyncCheckpointCallback(
             save_freq=50000,
-            save_path=f"{self.model_save_path}/{self.project_name}/{run.id}",
+            save_path=self._run_dir(run.id),
             name_prefix="training_timesteps_",
-            save_replay_buffer=True,
-            save_vecnormalize=True
+            keep_last=self.config.get("checkpoint_keep_last"),
+            keep_every=self.config.get("checkpoint_keep_every"),
+            keep_best=self.config.get("checkpoint_keep_best", 0),
+            # Scoring checkpoints costs episodes, only played when they are ranked
+            eval_env_fn=self._create_env() if self.config.get("checkpoint_keep_best") else None,
+            eval_episodes=self.config.get("checkpoint_eval_episodes", 10)
         )
         callbacks.append(checkpoint)
+        callbacks.append(RewardComponentsCallback())
 
         if self.wandb:
+            from wandb.integration.sb3 import WandbCallback
+
             wandb_callback = WandbCallback(
                 gradient_save_freq=50000,
                 model_save_path=f"{self.model_save_path}/{self.project_name}/{run.id}",
@@ -159,11 +270,45 @@ class BaseTrainer(ABC):
             callback=callbacks
         )
 
-        model.save(f"{self.model_save_path}/{self.project_name}/{run.id}/final.pt")
+        final_path = f"{self._run_dir(run.id)}/final.pt"
+        model.save(final_path)
+        save_flat_weights(model.policy.state_dict(), weights_path(final_path), step=model.num_timesteps)
+        self._get_manifest(run.id).add(final_path, model.num_timesteps, episode_metrics(model),
+                                       weights=weights_path(final_path))
 
         if self.wandb:
+            import wandb
+
             wandb.finish()
 
+    def evaluate(self, run_id, step=None, episodes=100, workers=None, envs_per_worker=8, seed=0,
+                 deterministic=True, max_steps=None):
+        """ Plays seeded episodes of a checkpoint of `run_id`, the latest by default, headless across a process pool.
+
+        Raises `CheckpointNotFoundError` if there is no such run or checkpoint.
+        """
+        checkpoint = self._find_checkpoint(run_id, step)
+        self._use_run_gym_config(run_id)
+        return evaluate_checkpoint(type(self), self.config, run_id, checkpoint, episodes,
+                                   workers or available_cores(), envs_per_worker, seed, deterministic, max_steps)
+
+    def _find_checkpoint(self, run_id, step=None):
+        """ Entry of the checkpoint of `run_id` saved after `step` timesteps, or of its latest. """
+        if not os.path.isdir(self._run_dir(run_id)):
+            raise CheckpointNotFoundError(f"No run {run_id} in {self.model_save_path}/{self.project_name}")
+        if step is None:
+            checkpoint = self._latest_checkpoint(run_id)
+        else:
+            checkpoint = next((entry for entry in self._get_manifest(run_id).checkpoints() if entry["step"] == step),
+                              None)
+            legacy = f"training_timesteps__{step}_steps.zip"
+            if checkpoint is None and os.path.exists(f"{self._run_dir(run_id)}/{legacy}"):
+                checkpoint = {"file": legacy, "step": step}
+        if checkpoint is None:
+            at = "" if step is None else f" at step {step}"
+            raise CheckpointNotFoundError(f"Run {run_id} has no checkpoint{at}")
+        return checkpoint
+
     @abstractmethod
     def watch(self, run_id):
         pass
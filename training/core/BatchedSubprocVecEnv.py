@@ -0,0 +1,206 @@
+import multiprocessing as mp
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+from stable_baselines3.common.vec_env.subproc_vec_env import _flatten_obs
+
+
+def get_context(start_method=None):
+    """ Multiprocessing context of the workers, with the same default as `SubprocVecEnv` (fork isn't thread safe). """
+    if start_method is None:
+        start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    return mp.get_context(start_method)
+
+
+def serve(remote, envs, cmd, data) -> bool:
+    """ Answers the commands every worker understands, besides "step" and "reset".
+
+    Returns False once the worker is closed.
+    """
+    from stable_baselines3.common.env_util import is_wrapped
+
+    if cmd == "render":
+        remote.send([env.render() for env in envs])
+    elif cmd == "close":
+        for env in envs:
+            env.close()
+        remote.close()
+        return False
+    elif cmd == "get_spaces":
+        remote.send((envs[0].observation_space, envs[0].action_space))
+    elif cmd == "env_method":
+        indices, name, args, kwargs = data
+        remote.send([getattr(envs[i], name)(*args, **kwargs) for i in indices])
+    elif cmd == "get_attr":
+        indices, name = data
+        remote.send([getattr(envs[i], name) for i in indices])
+    elif cmd == "set_attr":
+        indices, name, value = data
+        remote.send([setattr(envs[i], name, value) for i in indices])
+    elif cmd == "is_wrapped":
+        indices, wrapper_class = data
+        remote.send([is_wrapped(envs[i], wrapper_class) for i in indices])
+    else:
+        raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    return True
+
+
+def step_env(env, action):
+    """ Steps `env` with the same conversion to the SB3 VecEnv api as `SubprocVecEnv`, resetting it when done.
+
+    Returns the observation, reward, done, info and reset info.
+    """
+    observation, reward, terminated, truncated, info = env.step(action)
+    done = terminated or truncated
+    info["TimeLimit.truncated"] = truncated and not terminated
+    reset_info = {}
+    if done:
+        info["terminal_observation"] = observation
+        observation, reset_info = env.reset()
+    return observation, reward, done, info, reset_info
+
+
+def _worker(remote, parent_remote, env_fns_wrapper) -> None:
+    """ Steps a few environments for a `BatchedSubprocVecEnv`, one command per batch. """
+    parent_remote.close()
+    envs = [_patch_env(env_fn()) for env_fn in env_fns_wrapper.var]
+    observation_space = envs[0].observation_space
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                results = [step_env(env, action) for env, action in zip(envs, data)]
+                obs, rews, dones, infos, reset_infos = zip(*results)
+                remote.send((_flatten_obs(obs, observation_space), np.stack(rews), np.stack(dones),
+                             infos, reset_infos))
+            elif cmd == "reset":
+                obs, reset_infos = zip(*(env.reset(seed=seed) for env, seed in zip(envs, data)))
+                remote.send((_flatten_obs(obs, observation_space), reset_infos))
+            elif not serve(remote, envs, cmd, data):
+                break
+        except EOFError:
+            break
+
+
+def _concatenate_obs(batches, space):
+    """ Joins the stacked observations of each worker into those of all environments. """
+    if isinstance(space, spaces.Dict):
+        return OrderedDict([(k, np.concatenate([batch[k] for batch in batches])) for k in space.spaces.keys()])
+    if isinstance(space, spaces.Tuple):
+        return tuple(np.concatenate([batch[i] for batch in batches]) for i in range(len(space.spaces)))
+    return np.concatenate(batches)
+
+
+class BatchedSubprocVecEnv(VecEnv):
+    """ `SubprocVecEnv` running `envs_per_worker` environments in each process.
+
+    Our games take microseconds per step, so with one process per environment
+    most of the time goes to pickling and waking processes up. Here a worker
+    steps its environments in a loop and answers with a single message of
+    stacked observations, rewards and dones.
+    """
+
+    def __init__(self, env_fns, envs_per_worker, start_method=None) -> None:
+        self.waiting = False
+        self.closed = False
+        self.envs_per_worker = envs_per_worker
+
+        ctx = get_context(start_method)
+
+        # Environments of each worker
+        self._slices = [slice(start, min(start + envs_per_worker, len(env_fns)))
+                        for start in range(0, len(env_fns), envs_per_worker)]
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in self._slices])
+        self.processes = []
+        for work_remote, remote, envs in zip(self.work_remotes, self.remotes, self._slices):
+            args = (work_remote, remote, CloudpickleWrapper(env_fns[envs])) + self._worker_args(envs)
+            process = ctx.Process(target=self._worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(("get_spaces", None))
+        observation_space, action_space = self.remotes[0].recv()
+
+        super().__init__(len(env_fns), observation_space, action_space)
+
+    #: Function run by the worker processes
+    _worker = staticmethod(_worker)
+
+    def _worker_args(self, envs):
+        """ Arguments given to the worker of the environments in slice `envs`, after its pipe and environments. """
+        return ()
+
+    def step_async(self, actions):
+        for remote, envs in zip(self.remotes, self._slices):
+            remote.send(("step", actions[envs]))
+        self.waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        obs, rews, dones, infos, reset_infos = zip(*results)
+        self.reset_infos = [info for batch in reset_infos for info in batch]
+        return (_concatenate_obs(obs, self.observation_space), np.concatenate(rews), np.concatenate(dones),
+                [info for batch in infos for info in batch])
+
+    def reset(self):
+        for remote, envs in zip(self.remotes, self._slices):
+            remote.send(("reset", self._seeds[envs]))
+        results = [remote.recv() for remote in self.remotes]
+        obs, reset_infos = zip(*results)
+        self.reset_infos = [info for batch in reset_infos for info in batch]
+        # Seeds are only used once
+        self._reset_seeds()
+        return _concatenate_obs(obs, self.observation_space)
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def get_images(self):
+        if self.render_mode != "rgb_array":
+            warnings.warn(
+                f"The render mode is {self.render_mode}, but this method assumes it is `rgb_array` to obtain images."
+            )
+            return [None for _ in range(self.num_envs)]
+        for remote in self.remotes:
+            remote.send(("render", None))
+        return [image for remote in self.remotes for image in remote.recv()]
+
+    def get_attr(self, attr_name, indices=None):
+        return self._call("get_attr", indices, attr_name)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call("set_attr", indices, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._call("env_method", indices, method_name, method_args, method_kwargs)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self._call("is_wrapped", indices, wrapper_class)
+
+    def _call(self, cmd, indices, *data):
+        """ Sends `cmd` to the workers of the given environments and returns their answers, in order. """
+        indices = list(self._get_indices(indices))
+        targets = {}
+        for i in indices:
+            targets.setdefault(i // self.envs_per_worker, []).append(i % self.envs_per_worker)
+
+        for worker, local_indices in targets.items():
+            self.remotes[worker].send((cmd, (local_indices, *data)))
+        answers = {worker: iter(self.remotes[worker].recv()) for worker in targets}
+        return [next(answers[i // self.envs_per_worker]) for i in indices]
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import time
+
+
+class CheckpointNotFoundError(LookupError):
+    """ Raised when a run, or the checkpoint asked for, doesn't exist. """
+
+
+class CheckpointManifest:
+    """ Index of the checkpoints of a run, kept in `manifest.json` in the run directory.
+
+    Every checkpoint is listed with its step, timestamp, size and metrics,
+    and `latest` names the newest one, so finding it is a single small read
+    instead of listing the directory and parsing file names. `gym` keeps
+    the parameters the run's gym was created with, so watching or evaluating
+    the run plays the same game its policy was trained on. The file is
+    rewritten atomically, readers never see half of it, and only re-read when
+    it changed.
+    """
+
+    FILENAME = "manifest.json"
+
+    #: Checkpoint names written by `CheckpointCallback` before there was a manifest
+    LEGACY_PATTERN = re.compile(r"training_timesteps__(\d+)_steps\.zip")
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, self.FILENAME)
+        self._data = None
+        self._version = None
+
+    def _read(self):
+        """ The manifest contents, or None if the run has no manifest. """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        # os.replace gives every write a new inode
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version != self._version:
+            with open(self.path) as f:
+                self._data = json.load(f)
+            self._version = version
+        return self._data
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._data, self._version = data, None
+
+    def checkpoints(self):
+        """ Entries of every checkpoint, oldest first. """
+        data = self._read()
+        return [] if data is None else list(data["checkpoints"].values())
+
+    def latest(self):
+        """ Entry of the newest checkpoint, or None if there is none. """
+        data = self._read()
+        if data is None or data["latest"] is None:
+            return None
+        return data["checkpoints"][data["latest"]]
+
+    def gym_config(self):
+        """ Parameters of the run's gym, or None for runs saved before they were recorded. """
+        data = self._read()
+        return None if data is None else data.get("gym")
+
+    def set_gym_config(self, config):
+        """ Records the parameters the run's gym is created with. """
+        data = self._read() or {"latest": None, "checkpoints": {}}
+        self._write({**data, "gym": dict(config)})
+
+    def add(self, path, step, metrics=None, weights=None):
+        """ Lists the checkpoint saved at `path` after `step` timesteps, with
+        its policy weights exported to `weights`, and makes it the latest.
+        """
+        data = self._read() or {"latest": None, "checkpoints": {}}
+        name = os.path.basename(path)
+        data = {
+            **data,
+            "latest": name,
+            "checkpoints": {
+                **data["checkpoints"],
+                name: {
+                    "file": name,
+                    "step": int(step),
+                    "timestamp": time.time(),
+                    "size": os.path.getsize(path),
+                    "metrics": metrics or {},
+                    "weights": None if weights is None else os.path.basename(weights),
+                },
+            },
+        }
+        self._write(data)
+        return data["checkpoints"][name]
+
+    def prune(self, keep_last=None, keep_every=None, keep_best=0, metric="ep_rew_mean"):
+        """ Deletes the checkpoints no retention rule keeps and returns their entries.
+
+        Kept are the latest checkpoint, the `keep_last` newest, the first one
+        past every multiple of `keep_every` timesteps and the `keep_best` with
+        the highest `metric`. Without any rule everything is kept.
+        """
+        if not (keep_last or keep_every or keep_best):
+            return []
+        data = self._read()
+        if data is None:
+            return []
+
+        entries = list(data["checkpoints"].values())
+        kept = {data["latest"]}
+        if keep_last:
+            kept.update(entry["file"] for entry in entries[-keep_last:])
+        if keep_every:
+            firsts = {}
+            for entry in entries:
+                firsts.setdefault(entry["step"] // keep_every, entry["file"])
+            kept.update(firsts.values())
+        if keep_best:
+            scored = [entry for entry in entries if metric in entry["metrics"]]
+            scored.sort(key=lambda entry: entry["metrics"][metric], reverse=True)
+            kept.update(entry["file"] for entry in scored[:keep_best])
+
+        removed = [entry for entry in entries if entry["file"] not in kept]
+        if not removed:
+            return []
+
+        # The manifest stops listing them before they are gone
+        self._write({
+            **data,
+            "checkpoints": {name: entry for name, entry in data["checkpoints"].items() if name in kept},
+        })
+        for entry in removed:
+            for name in (entry["file"], entry.get("weights")):
+                if name is None:
+                    continue
+                try:
+                    os.remove(os.path.join(self.run_dir, name))
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def legacy_latest(self):
+        """ Entry of the newest checkpoint of a run saved before manifests, found by listing its directory. """
+        steps = [int(match.group(1)) for match in map(self.LEGACY_PATTERN.fullmatch, os.listdir(self.run_dir))
+                 if match is not None]
+        if not steps:
+            return None
+        step = max(steps)
+        return {"file": f"training_timesteps__{step}_steps.zip", "step": step}
@@ -0,0 +1,57 @@
+import threading
+
+
+class PolicyReloader(threading.Thread):
+    """ Loads the newest checkpoint of a run in the background while `watch` plays.
+
+    Every `interval` seconds the thread checks the run's checkpoint manifest
+    and, when there is a newer checkpoint, loads it off the render thread,
+    only its exported policy weights when it has some. The playback picks it
+    up through `model` between episodes, so a long run saving a checkpoint
+    never freezes the game. A checkpoint that fails to load is reported once
+    and skipped, the current model keeps playing.
+    """
+
+    def __init__(self, trainer, run_id, model, iteration, interval=5.0):
+        super().__init__(name=f"PolicyReloader-{run_id}", daemon=True)
+        self.trainer = trainer
+        self.run_id = run_id
+        self.interval = interval
+        # Swapped as one tuple, readers never see the model of one checkpoint with the step of another
+        self._current = (model, iteration)
+        self._failed_step = None
+        self._stopped = threading.Event()
+
+    @property
+    def model(self):
+        return self._current[0]
+
+    @property
+    def iteration(self):
+        return self._current[1]
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> bool:
+        """ Loads the newest checkpoint if it isn't the current one. Returns whether the model changed. """
+        checkpoint = None
+        try:
+            checkpoint = self.trainer._latest_checkpoint(self.run_id)
+            if checkpoint is None or checkpoint["step"] in (self.iteration, self._failed_step):
+                return False
+            model = self.trainer._load_checkpoint(self.run_id, checkpoint, current_model=self.model)
+        except Exception as e:
+            if checkpoint is not None:
+                print(f"Could not load {checkpoint['file']}, keeping the current model: {e}")
+                self._failed_step = checkpoint["step"]
+            else:
+                print(f"Could not read the checkpoints of run {self.run_id}: {e}")
+            return False
+
+        self._current = (model, checkpoint["step"])
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
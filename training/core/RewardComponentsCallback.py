@@ -0,0 +1,34 @@
+from collections import defaultdict
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+class RewardComponentsCallback(BaseCallback):
+    """ Logs the mean of every reward component found in the step infos.
+
+    Gyms report the parts of their shaped reward in the step info under keys
+    starting with `prefix`. They are summed every step and their means are
+    recorded once per rollout, so they show up in tensorboard and wandb.
+    """
+
+    def __init__(self, prefix="reward/", verbose=0):
+        super().__init__(verbose)
+        self.prefix = prefix
+        self._sums = defaultdict(float)
+        self._count = 0
+
+    def _on_step(self) -> bool:
+        for info in self.locals["infos"]:
+            for key, value in info.items():
+                if key.startswith(self.prefix):
+                    self._sums[key] += value
+        self._count += len(self.locals["infos"])
+
+        return True
+
+    def _on_rollout_end(self) -> None:
+        for key, total in self._sums.items():
+            self.logger.record(key, total / self._count)
+
+        self._sums.clear()
+        self._count = 0
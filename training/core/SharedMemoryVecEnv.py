@@ -0,0 +1,105 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+
+from training.core.BatchedSubprocVecEnv import BatchedSubprocVecEnv, get_context, serve, step_env
+
+
+def _attach(buffers, envs):
+    """ NumPy views of the shared buffers, restricted to the environments in slice `envs`. """
+    return {name: np.frombuffer(raw, dtype).reshape(shape)[envs] for name, (raw, dtype, shape) in buffers.items()}
+
+
+def _worker(remote, parent_remote, env_fns_wrapper, buffers, indices) -> None:
+    """ Steps a few environments for a `SharedMemoryVecEnv`, writing their results to the shared buffers. """
+    parent_remote.close()
+    envs = [_patch_env(env_fn()) for env_fn in env_fns_wrapper.var]
+    views = _attach(buffers, indices)
+    observations, terminal_observations = views["observations"], views["terminal_observations"]
+    rewards, dones = views["rewards"], views["dones"]
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                infos, reset_infos = [], []
+                for i, (env, action) in enumerate(zip(envs, data)):
+                    observation, rewards[i], dones[i], info, reset_info = step_env(env, action)
+                    if dones[i]:
+                        terminal_observations[i] = info.pop("terminal_observation")
+                    observations[i] = observation
+                    infos.append(info)
+                    reset_infos.append(reset_info)
+                # The answer is also the signal that the buffers are written
+                remote.send((infos, reset_infos))
+            elif cmd == "reset":
+                reset_infos = []
+                for i, (env, seed) in enumerate(zip(envs, data)):
+                    observations[i], reset_info = env.reset(seed=seed)
+                    reset_infos.append(reset_info)
+                remote.send(reset_infos)
+            elif not serve(remote, envs, cmd, data):
+                break
+        except EOFError:
+            break
+
+
+class SharedMemoryVecEnv(BatchedSubprocVecEnv):
+    """ `BatchedSubprocVecEnv` whose workers write observations, rewards and
+    dones straight into shared memory.
+
+    Only actions, infos and control messages go through the pipes, so the cost
+    of a step no longer grows with the size of the observations. Observations
+    must be a `Box`.
+    """
+
+    def __init__(self, env_fns, envs_per_worker=1, start_method=None) -> None:
+        # The buffers are handed to the workers when they start, before they
+        # can tell us the observation space
+        probe = env_fns[0]()
+        observation_space = probe.observation_space
+        probe.close()
+        if not isinstance(observation_space, spaces.Box):
+            raise ValueError(f"SharedMemoryVecEnv needs Box observations, got {observation_space}")
+
+        ctx = get_context(start_method)
+        num_envs = len(env_fns)
+        layouts = {
+            "observations": (observation_space.dtype, (num_envs, *observation_space.shape)),
+            "terminal_observations": (observation_space.dtype, (num_envs, *observation_space.shape)),
+            # float64 like the rewards of SubprocVecEnv
+            "rewards": (np.float64, (num_envs,)),
+            "dones": (np.bool_, (num_envs,)),
+        }
+        self._buffers = {
+            name: (ctx.RawArray("b", max(np.dtype(dtype).itemsize * int(np.prod(shape)), 1)), dtype, shape)
+            for name, (dtype, shape) in layouts.items()
+        }
+        self._views = _attach(self._buffers, slice(None))
+
+        super().__init__(env_fns, envs_per_worker, start_method)
+
+    _worker = staticmethod(_worker)
+
+    def _worker_args(self, envs):
+        return self._buffers, envs
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        infos = [info for batch, _ in results for info in batch]
+        self.reset_infos = [info for _, batch in results for info in batch]
+        dones = self._views["dones"].copy()
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self._views["terminal_observations"][i].copy()
+
+        # Copies, the workers overwrite the buffers on the next step while the
+        # learner still holds these
+        return self._views["observations"].copy(), self._views["rewards"].copy(), dones, infos
+
+    def reset(self):
+        for remote, envs in zip(self.remotes, self._slices):
+            remote.send(("reset", self._seeds[envs]))
+        self.reset_infos = [info for remote in self.remotes for info in remote.recv()]
+        # Seeds are only used once
+        self._reset_seeds()
+        return self._views["observations"].copy()
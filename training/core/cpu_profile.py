@@ -0,0 +1,60 @@
+""" Training device and the split of the CPU cores between the learner and the environment workers. """
+
+import os
+
+import torch
+
+
+def resolve_device(device="auto"):
+    """ `cuda` if a GPU is available and `cpu` otherwise for `auto`, any other device as is. """
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def partition_cores(cores, worker_processes, device):
+    """ Splits `cores` into those of the learner and those of `worker_processes` environment workers.
+
+    Without worker processes the learner keeps every core. On CPU it keeps one
+    core per worker less than the machine has, at least one, and on a GPU a
+    single core to feed it. A one core machine is shared by everyone.
+    """
+    cores = sorted(cores)
+    if worker_processes == 0:
+        return cores, []
+    if len(cores) == 1:
+        return cores, cores
+
+    learner = max(len(cores) - worker_processes, 1) if torch.device(device).type == "cpu" else 1
+    learner = min(learner, len(cores) - 1)
+    return cores[:learner], cores[learner:]
+
+
+def apply_cpu_profile(env, device, torch_threads=None, cpu_affinity=False, echo=print):
+    """ Sizes the torch thread pool of the learner to its share of the cores
+    and, with `cpu_affinity`, pins the learner and each worker process of
+    `env` to their cores.
+
+    Returns the learner and worker cores.
+    """
+    # Worker processes of SubprocVecEnv and our batched backends, under any wrapper
+    while hasattr(env, "venv"):
+        env = env.venv
+    processes = getattr(env, "processes", [])
+
+    cores = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+    learner_cores, worker_cores = partition_cores(cores, len(processes), device)
+
+    torch.set_num_threads(torch_threads or len(learner_cores))
+    echo(f"Learner on {len(learner_cores)} core(s) with {torch.get_num_threads()} torch thread(s), "
+         f"{len(processes)} worker process(es) on {len(worker_cores)} core(s)")
+
+    if cpu_affinity:
+        if not hasattr(os, "sched_setaffinity"):
+            echo("CPU affinity is not supported on this platform, not pinning")
+        else:
+            os.sched_setaffinity(0, learner_cores)
+            for i, process in enumerate(processes):
+                os.sched_setaffinity(process.pid, {worker_cores[i % len(worker_cores)]})
+
+    return learner_cores, worker_cores
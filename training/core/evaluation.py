@@ -0,0 +1,145 @@
+""" Headless evaluation of a checkpoint: seeded episodes played across a process pool, with one batched `predict` per step. """
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+from training.core.BatchedSubprocVecEnv import get_context
+
+
+def run_episodes(model, make_env, seeds, num_envs=8, deterministic=True, max_steps=None):
+    """ Plays one episode per seed, `num_envs` games at a time with a single `predict` call per step for all of them.
+
+    A game starts the next seed as soon as its episode ends, so the results
+    don't depend on how the seeds are split between workers. Episodes still
+    running after `max_steps` steps are cut.
+
+    Returns `(return, length, score, cut)` per episode, in the order of
+    `seeds`. `score` is the last `score` of the step infos, NaN for gyms that
+    don't report one.
+    """
+    seeds = list(seeds)
+    envs = [make_env() for _ in range(min(num_envs, len(seeds)))]
+    results = [None] * len(seeds)
+
+    # Episode played by each game, -1 once there are none left
+    episodes = np.full(len(envs), -1)
+    returns = np.zeros(len(envs))
+    lengths = np.zeros(len(envs), dtype=np.int64)
+    scores = np.full(len(envs), np.nan)
+    observations = [None] * len(envs)
+    next_episode = 0
+
+    def start(i):
+        nonlocal next_episode
+        if next_episode == len(seeds):
+            episodes[i] = -1
+            return
+        observations[i], info = envs[i].reset(seed=int(seeds[next_episode]))
+        episodes[i], returns[i], lengths[i] = next_episode, 0.0, 0
+        scores[i] = info.get("score", np.nan)
+        next_episode += 1
+
+    for i in range(len(envs)):
+        start(i)
+
+    while (playing := np.flatnonzero(episodes >= 0)).size:
+        actions, _ = model.predict(np.stack([observations[i] for i in playing]), deterministic=deterministic)
+        for i, action in zip(playing, actions):
+            observations[i], reward, terminated, truncated, info = envs[i].step(action)
+            returns[i] += reward
+            lengths[i] += 1
+            scores[i] = info.get("score", np.nan)
+
+            cut = not (terminated or truncated) and max_steps is not None and lengths[i] >= max_steps
+            if terminated or truncated or cut:
+                results[episodes[i]] = (float(returns[i]), int(lengths[i]), float(scores[i]), cut)
+                start(i)
+
+    for env in envs:
+        env.close()
+    return results
+
+
+def _evaluate_seeds(trainer_class, config, run_id, checkpoint, seeds, num_envs, deterministic, max_steps):
+    """ Task of a pool worker: loads the checkpoint's policy on the CPU and plays the episodes of `seeds`. """
+    # The workers already fill the cores, one thread each
+    torch.set_num_threads(1)
+    trainer = trainer_class({**config, "device": "cpu"})
+
+    def make_env():
+        return trainer.gym(**trainer._filter_config())
+
+    env = make_env()
+    policy = trainer._load_policy(run_id, checkpoint, env)
+    env.close()
+    return run_episodes(policy, make_env, seeds, num_envs, deterministic, max_steps)
+
+
+def _distribution(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "p10": float(np.percentile(values, 10)),
+        "median": float(np.median(values)),
+        "p90": float(np.percentile(values, 90)),
+        "max": float(values.max()),
+    }
+
+
+def evaluate_checkpoint(trainer_class, config, run_id, checkpoint, episodes=100, workers=1, envs_per_worker=8,
+                        seed=0, deterministic=True, max_steps=None):
+    """ Plays `episodes` episodes, seeded from `seed` on, of `checkpoint` across `workers` processes.
+
+    Returns a report with the distributions of the episode returns, lengths
+    and game scores and the throughput, wall time included.
+    """
+    seeds = np.arange(seed, seed + episodes)
+    chunks = [chunk.tolist() for chunk in np.array_split(seeds, max(min(workers, episodes), 1)) if len(chunk)]
+    args = (trainer_class, config, run_id, checkpoint)
+
+    start = time.perf_counter()
+    if len(chunks) == 1:
+        results = _evaluate_seeds(*args, chunks[0], envs_per_worker, deterministic, max_steps)
+    else:
+        with ProcessPoolExecutor(len(chunks), mp_context=get_context()) as pool:
+            futures = [pool.submit(_evaluate_seeds, *args, chunk, envs_per_worker, deterministic, max_steps)
+                       for chunk in chunks]
+            results = [result for future in futures for result in future.result()]
+    seconds = time.perf_counter() - start
+
+    returns, lengths, scores, cut = zip(*results)
+    report = {
+        "checkpoint": checkpoint["file"],
+        "step": checkpoint["step"],
+        "episodes": len(results),
+        "cut": int(sum(cut)),
+        "seconds": seconds,
+        "episodes_per_second": len(results) / seconds,
+        "steps_per_second": sum(lengths) / seconds,
+        "return": _distribution(returns),
+        "length": _distribution(lengths),
+    }
+    if not np.isnan(scores).any():
+        report["score"] = _distribution(scores)
+    return report
+
+
+def format_report(report):
+    """ Lines describing an `evaluate_checkpoint` report. """
+    lines = [
+        f"{report['checkpoint']} ({report['step']:,} timesteps): {report['episodes']} episodes in "
+        f"{report['seconds']:.1f}s, {report['episodes_per_second']:,.1f} episodes/s, "
+        f"{report['steps_per_second']:,.0f} steps/s",
+    ]
+    if report["cut"]:
+        lines.append(f"{report['cut']} episode(s) cut at the step limit")
+    for name in ("return", "length", "score"):
+        if name in report:
+            stats = report[name]
+            lines.append(f"{name:>6}: " + "  ".join(f"{key} {value:.2f}" for key, value in stats.items()))
+    return lines
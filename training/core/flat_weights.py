@@ -0,0 +1,93 @@
+""" Policy weights as a JSON header followed by aligned, contiguous tensors, loaded by memory-mapping the file.
+
+Layout: the magic bytes, the header length as a little-endian uint64, the
+header and then every tensor at its offset, each aligned to `ALIGNMENT`
+bytes. Floating point tensors are stored as float32. The header maps every
+tensor name to its dtype, shape and offset from the start of the data, and
+carries free-form metadata.
+"""
+
+import json
+import os
+
+import numpy as np
+import torch
+
+MAGIC = b"MLPWGT01"
+ALIGNMENT = 64
+#: Suffix of the weights exported next to a checkpoint
+SUFFIX = ".weights"
+
+
+def _aligned(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def save_flat_weights(state_dict, path, **metadata):
+    """ Writes the tensors of `state_dict` to `path`, atomically. """
+    arrays = {}
+    for name, tensor in state_dict.items():
+        array = tensor.detach().cpu().numpy()
+        if np.issubdtype(array.dtype, np.floating):
+            array = array.astype(np.float32, copy=False)
+        arrays[name] = np.ascontiguousarray(array)
+
+    tensors, offset = {}, 0
+    for name, array in arrays.items():
+        tensors[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps({"tensors": tensors, "metadata": metadata}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + tensors[name]["offset"])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_flat_weights(path):
+    """ Memory-maps the weights at `path`.
+
+    Returns the tensors by name, which share their memory with the file until
+    written to, and the metadata.
+    """
+    # Copy on write, torch wants writable arrays but the file is never changed
+    buffer = np.memmap(path, dtype=np.uint8, mode="c")
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a flat weights file")
+
+    header_size = int.from_bytes(bytes(buffer[len(MAGIC):len(MAGIC) + 8]), "little")
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[header_start:header_start + header_size]))
+    data_start = _aligned(header_start + header_size)
+
+    tensors = {}
+    for name, spec in header["tensors"].items():
+        dtype = np.dtype(spec["dtype"])
+        start = data_start + spec["offset"]
+        size = dtype.itemsize * int(np.prod(spec["shape"]))
+        array = buffer[start:start + size].view(dtype).reshape(spec["shape"])
+        tensors[name] = torch.from_numpy(array)
+    return tensors, header["metadata"]
+
+
+def load_policy_weights(policy, path):
+    """ Drops the weights at `path` into `policy`, without copying them if it is on the CPU. Returns the metadata. """
+    tensors, metadata = load_flat_weights(path)
+    on_cpu = all(parameter.device.type == "cpu" for parameter in policy.parameters())
+    policy.load_state_dict(tensors, assign=on_cpu)
+    return metadata
+
+
+def weights_path(checkpoint_path):
+    """ Path of the weights exported next to the checkpoint at `checkpoint_path`. """
+    root, extension = os.path.splitext(checkpoint_path)
+    return root + SUFFIX if extension == ".zip" else checkpoint_path + SUFFIX
@@ -0,0 +1,90 @@
+""" Layouts of the vectorized environments and the `auto` choice among them. """
+
+import math
+import os
+import time
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+from training.core.BatchedSubprocVecEnv import BatchedSubprocVecEnv
+from training.core.SharedMemoryVecEnv import SharedMemoryVecEnv
+
+#: Values of the `vec_backend` option. `native` is built by the trainers, the
+#: others by `make_vec_env`.
+VEC_BACKENDS = ("auto", "dummy", "native", "shared-memory", "subproc", "subproc-batched")
+
+
+def available_cores():
+    """ Number of cores this process may run on. """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def make_vec_env(env_fns, backend, envs_per_worker=None):
+    """ Builds the VecEnv of the environments made by `env_fns` with a `dummy`,
+    `subproc`, `subproc-batched` or `shared-memory` backend.
+
+    `subproc-batched` and `shared-memory` run `envs_per_worker` environments
+    per process, by default as many as needed for one process per core.
+    """
+    if backend == "dummy":
+        return DummyVecEnv(env_fns)
+    if backend == "subproc":
+        return SubprocVecEnv(env_fns)
+    if backend in ("subproc-batched", "shared-memory"):
+        if envs_per_worker is None:
+            envs_per_worker = math.ceil(len(env_fns) / available_cores())
+        if backend == "shared-memory":
+            return SharedMemoryVecEnv(env_fns, envs_per_worker)
+        return BatchedSubprocVecEnv(env_fns, envs_per_worker)
+
+    raise ValueError(f"Unknown vec backend {backend!r}, expected one of {VEC_BACKENDS}")
+
+
+def candidate_layouts(num_envs, cores):
+    """ The `(backend, envs_per_worker)` pairs worth timing for `num_envs` environments on `cores` cores. """
+    layouts = [("dummy", None)]
+    if num_envs == 1 or cores == 1:
+        # Nothing to run in parallel
+        return layouts
+
+    layouts.append(("subproc", None))
+    for workers in (cores, cores // 2):
+        envs_per_worker = math.ceil(num_envs / max(workers, 1))
+        if 1 < envs_per_worker < num_envs and ("subproc-batched", envs_per_worker) not in layouts:
+            layouts.append(("subproc-batched", envs_per_worker))
+            layouts.append(("shared-memory", envs_per_worker))
+    return layouts
+
+
+def measure_layout(env_fns, backend, envs_per_worker=None, steps=300):
+    """ Environment steps per second of a layout, taking random actions. """
+    env = make_vec_env(env_fns, backend, envs_per_worker)
+    try:
+        env.reset()
+        actions = [np.stack([env.action_space.sample() for _ in range(env.num_envs)]) for _ in range(16)]
+        for i in range(10):
+            env.step(actions[i % len(actions)])
+
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i % len(actions)])
+        return steps * env.num_envs / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+def select_vec_backend(env_fns, steps=300, echo=print):
+    """ Times every candidate layout for `env_fns` on this machine and returns the fastest `(backend, envs_per_worker)`. """
+    best = None
+    for backend, envs_per_worker in candidate_layouts(len(env_fns), available_cores()):
+        rate = measure_layout(env_fns, backend, envs_per_worker, steps)
+        name = backend if envs_per_worker is None else f"{backend} ({envs_per_worker} envs per worker)"
+        echo(f"{name}: {rate:,.0f} steps/s")
+
+        if best is None or rate > best[0]:
+            best = (rate, backend, envs_per_worker)
+
+    return best[1], best[2]
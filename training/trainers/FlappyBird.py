@@ -4,17 +4,46 @@ import numpy as np
 from stable_baselines3 import PPO
 
 from gyms.FlappyBird.FlappyBirdSimpleGym import FlappyBirdSimpleGym
+from gyms.FlappyBird.FlappyBirdVecEnv import FlappyBirdVecEnv
 from training.core.BaseTrainer import BaseTrainer
 
 
 class FlappyBird(BaseTrainer):
 
     def __init__(self, config):
+        self._config = {
+            "action_repeat": 1,
+            "checkpoint_eval_episodes": 10,
+            "checkpoint_keep_best": 0,
+            "checkpoint_keep_every": None,
+            "checkpoint_keep_last": None,
+            "cpu_affinity": False,
+            "device": "auto",
+            "ent_coef": 0.02,
+            "envs_per_worker": None,
+            "gamma": 0.99,
+            "gae_lambda": 0.95,
+            "learning_rate": 1.5e-4,
+            "max_pool_obs": False,
+            "num_envs": 1,
+            "n_steps": 1024,
+            "policy": "MlpPolicy",
+            "reload_interval": 5.0,
+            "torch_threads": None,
+            "vec_backend": "subproc",
+            "vf_coef": 0.5
+        }
         super().__init__(config, FlappyBirdSimpleGym)
 
     @property
     def parameters(self):
-        return []
+        return [
+            "action_repeat",
+            "max_pool_obs",
+            "normalize_obs",
+            "pipe_gap",
+            "pixel_collision"
+        ]
 
     @property
     def project_name(self):
@@ -24,26 +53,28 @@ class FlappyBird(BaseTrainer):
     def training_algorithm(self):
         return PPO
 
+    @property
+    def native_vec_env(self):
+        return FlappyBirdVecEnv
+
     @property
     def config(self):
-        return {
-            "ent_coef": 0.02,
-            "gamma": 0.99,
-            "gae_lambda": 0.95,
-            "learning_rate": 1.5e-4,
-            "policy": "MlpPolicy",
-            "vf_coef": 0.5
-        }
+        return self._config
+
+    @config.setter
+    def config(self, new_config):
+        self._config.update(new_config)
 
     def watch(self, run_id):
         fps = 30
         frame_time = 1.0 / fps
-        env = FlappyBirdSimpleGym()
-        model, iteration = self._get_model(run_id, env, None, None)
+        env = self._create_watch_env(run_id)
+        reloader = self._start_reloader(run_id, env)
+        model = reloader.model
 
         while True:
 
-            state = env.reset()
+            state, _ = env.reset()
             done = False
             while not done:
                 start_time = time.time()
@@ -59,7 +90,8 @@ class FlappyBird(BaseTrainer):
                 sleep_time = max(frame_time - elapsed_time, 0)
                 time.sleep(sleep_time)
 
-            model, iteration = self._get_model(run_id, env, model, iteration)
+            # Newer checkpoints are loaded in the background, swap between episodes
+            model = reloader.model
 
     def play(self):
         pass
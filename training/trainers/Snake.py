@@ -3,6 +3,7 @@ import time
 from stable_baselines3 import PPO
 
 from gyms.Snake.SnakeGym import SnakeGym
+from gyms.Snake.SnakeVecEnv import SnakeVecEnv
 from training.core.BaseTrainer import BaseTrainer
 
 
@@ -10,18 +11,31 @@ class Snake(BaseTrainer):
 
     def __init__(self, config):
         self._config = {
+            "action_repeat": 1,
+            "checkpoint_eval_episodes": 10,
+            "checkpoint_keep_best": 0,
+            "checkpoint_keep_every": None,
+            "checkpoint_keep_last": None,
+            "cpu_affinity": False,
+            "cycle_detection": None,
             "death_penalty": -10,
+            "device": "auto",
             "dist_reward": 10,
             "ent_coef": 0.02,
+            "envs_per_worker": None,
             "food_reward": 25,
             "gamma": 0.99,
             "gae_lambda": 0.95,
             "learning_rate": 1.5e-4,
             "living_bonus": -0.1,
+            "max_pool_obs": False,
             "max_step": 4096,
             "num_envs": 1,
             "n_steps": 1024,
             "policy": "MlpPolicy",
+            "reload_interval": 5.0,
+            "torch_threads": None,
+            "vec_backend": "subproc",
             "vf_coef": 0.5
         }
         super().__init__(config, SnakeGym)
@@ -34,6 +48,10 @@ class Snake(BaseTrainer):
     def training_algorithm(self):
         return PPO
 
+    @property
+    def native_vec_env(self):
+        return SnakeVecEnv
+
     @property
     def config(self):
         return self._config
@@ -45,38 +63,45 @@ class Snake(BaseTrainer):
     @property
     def parameters(self):
         return [
+            "action_repeat",
+            "cycle_detection",
             "death_penalty",
             "dist_reward",
             "food_reward",
             "fps",
             "living_bonus",
-            "max_step"
+            "max_pool_obs",
+            "max_step",
+            "obs_mode",
+            "window_size"
         ]
 
     def watch(self, run_id):
         fps = 30
         frame_time = 1.0 / fps
-        env = SnakeGym(render_mode="human", max_step=self.config.get("max_step"))
-        model, iteration = self._get_model(run_id, env, None, None)
+        env = self._create_watch_env(run_id)
+        reloader = self._start_reloader(run_id, env)
+        model = reloader.model
 
         while True:
 
-            env.reset()
+            state, _ = env.reset()
             done = False
             while not done:
                 start_time = time.time()
 
                 env.render()
-                state = env.get_obs()
                 action, _ = model.predict(state)
                 next_state, reward, done, _, __ = env.step(action)
+                state = next_state
 
                 end_time = time.time()
                 elapsed_time = end_time - start_time
                 sleep_time = max(frame_time - elapsed_time, 0)
                 time.sleep(sleep_time)
 
-            model, iteration = self._get_model(run_id, env, model, iteration)
+            # Newer checkpoints are loaded in the background, swap between episodes
+            model = reloader.model
 
     def play(self):
         env = SnakeGym()
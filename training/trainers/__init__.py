@@ -1,7 +1,26 @@
-from training.trainers.FlappyBird import FlappyBird
-from training.trainers.Snake import Snake
+import importlib
 
-__all__ = [
-    FlappyBird,
-    Snake
-]
+#: Module of every trainer, imported only when the trainer is used
+TRAINERS = {
+    "FlappyBird": "training.trainers.FlappyBird",
+    "Snake": "training.trainers.Snake",
+}
+
+__all__ = list(TRAINERS)
+
+
+def get_trainer(name):
+    """ Imports and returns the trainer class called `name`. """
+    if name not in TRAINERS:
+        raise ValueError(f"Unknown trainer {name!r}, expected one of {', '.join(TRAINERS)}")
+    trainer = getattr(importlib.import_module(TRAINERS[name]), name)
+    # Importing the module bound it to its name on this package, the name means the class
+    globals()[name] = trainer
+    return trainer
+
+
+def __getattr__(name):
+    # `from training.trainers import Snake` keeps working without importing every trainer
+    if name in TRAINERS:
+        return get_trainer(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")